@@ -0,0 +1,60 @@
+"""Functions executed in the rembg worker processes.
+
+Kept out of server.py so spawned workers import only Pillow and rembg,
+not the web app, its database client or Playwright. Each worker keeps one
+rembg session per model for its whole lifetime.
+"""
+import io
+import os
+
+from PIL import Image, ImageOps
+
+_sessions = {}
+
+
+def init_worker(threads: int, preload_models: list):
+    """Process initializer: pin ONNX Runtime threads and optionally load models up front."""
+    # rembg.new_session sizes the ONNX Runtime thread pools from OMP_NUM_THREADS.
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    for model in preload_models:
+        try:
+            get_session(model)
+        except Exception:
+            # Missing rembg or model download failure surfaces on the first request instead.
+            pass
+
+
+def get_session(model: str):
+    session = _sessions.get(model)
+    if session is None:
+        from rembg import new_session
+        session = _sessions[model] = new_session(model)
+    return session
+
+
+def warm_up(model: str) -> bool:
+    get_session(model)
+    return True
+
+
+def remove_bg_mask(contents: bytes, model: str) -> bytes:
+    """Run rembg on an uploaded image and return the alpha mask as an L-mode PNG."""
+    from rembg import remove
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(contents)))
+    mask = remove(img, session=get_session(model), only_mask=True)
+    output = io.BytesIO()
+    mask.convert('L').save(output, format='PNG')
+    return output.getvalue()
+
+
+def remove_bg_masks(items: list, model: str) -> list:
+    """Batch variant: one (mask_png, None) or (None, error) tuple per input, in order."""
+    results = []
+    for contents in items:
+        try:
+            results.append((remove_bg_mask(contents, model), None))
+        except ImportError:
+            raise
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
@@ -1,24 +1,40 @@
-from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Form, Body
-from fastapi.responses import StreamingResponse, Response
+from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Form, Body, Header
+from fastapi.responses import StreamingResponse, Response, FileResponse, JSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, ReplaceOne, UpdateOne
+from pymongo.errors import OperationFailure
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Iterator
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 import base64
 import io
 import json
+import re
 import hashlib
+import heapq
+import math
 import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import time
 import zipfile
-from PIL import Image, ImageFilter, ImageOps
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit, parse_qs
+from PIL import Image, ImageFilter, ImageOps, UnidentifiedImageError
 import aiofiles
+import httpx
 from playwright.async_api import async_playwright
+import image_worker
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -46,8 +62,8 @@ EXPORTS_DIR = ROOT_DIR / "exports"
 EXPORTS_DIR.mkdir(exist_ok=True)
 
 # ==================== PLAYWRIGHT BROWSER POOL ====================
-_browser = None
 _playwright = None
+_playwright_lock = asyncio.Lock()
 
 def resolve_chromium_path() -> str:
     env_path = os.environ.get('CHROMIUM_PATH')
@@ -67,13 +83,11 @@ def resolve_chromium_path() -> str:
     )
 
 
-async def get_browser():
-    global _browser, _playwright
-    if _browser is not None and _browser.is_connected():
-        return _browser
-
-    if _playwright is None:
-        _playwright = await async_playwright().start()
+async def launch_browser():
+    global _playwright
+    async with _playwright_lock:
+        if _playwright is None:
+            _playwright = await async_playwright().start()
 
     chrome_path = resolve_chromium_path()
 
@@ -85,26 +99,364 @@ async def get_browser():
     last_err = None
     for args in launch_profiles:
         try:
-            _browser = await _playwright.chromium.launch(executable_path=chrome_path, args=args)
-            if _browser and _browser.is_connected():
+            browser = await _playwright.chromium.launch(executable_path=chrome_path, args=args)
+            if browser and browser.is_connected():
                 logger.info(f"Playwright browser launched successfully. binary={chrome_path} args={args}")
-                return _browser
+                return browser
         except Exception as e:
             last_err = e
             logger.warning(f"Chromium launch failed with args {args}: {e}")
 
     raise RuntimeError(f"Playwright browser launch failed after retries. binary={chrome_path} error={last_err}")
 
-async def render_html_to_pdf(html_content: str, width_mm: int = 210, height_mm: int = 297, landscape: bool = False) -> bytes:
-    try:
-        browser = await get_browser()
-    except Exception as e:
-        logger.error(f"Browser launch failed: {e}")
-        raise HTTPException(500, f"Playwright tarayici baslatilamadi: {str(e)}")
-    page = await browser.new_page()
-    try:
+# ----- Warm page pool -----
+RENDER_POOL_PREWARM = int(os.environ.get('RENDER_POOL_PREWARM', '2'))
+RENDER_PAGE_MAX_USES = int(os.environ.get('RENDER_PAGE_MAX_USES', '50'))
+DEFAULT_VIEWPORT = {'width': 1280, 'height': 720}
+BLANK_HTML = '<!DOCTYPE html><html><head></head><body></body></html>'
+
+
+class PagePool:
+    """Bounded pool of pre-warmed pages, each in its own browser context.
+
+    Pages are reset between jobs and recycled after `max_uses` renders, after a
+    crash, or when the job using them raised.
+    """
+
+    def __init__(self, size: int, max_uses: int):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self._idle: List[dict] = []
+        self._in_use = 0
+        self._sem = asyncio.Semaphore(self.size)
+        self.metrics = {"hits": 0, "misses": 0, "waits": 0, "wait_ms_total": 0.0, "recycled": 0, "crashed": 0}
+
+    async def _create(self, browser) -> dict:
+        context = await browser.new_context(viewport=DEFAULT_VIEWPORT)
+        await context.route(f"{ASSET_HOST}/blob/**", serve_blob_route)
+        page = await context.new_page()
+        slot = {"browser": browser, "context": context, "page": page, "uses": 0, "crashed": False}
+        page.on("crash", lambda _: slot.__setitem__("crashed", True))
+        return slot
+
+    async def _discard(self, slot: dict):
+        try:
+            await slot["context"].close()
+        except Exception:
+            pass
+
+    async def _reset(self, slot: dict) -> bool:
+        page = slot["page"]
+        try:
+            await page.set_content(BLANK_HTML)
+            await page.evaluate("() => { try { localStorage.clear(); sessionStorage.clear(); } catch (e) {} }")
+            await slot["context"].clear_cookies()
+            await page.set_viewport_size(DEFAULT_VIEWPORT)
+            return True
+        except Exception as e:
+            logger.warning(f"Render page reset failed, recycling: {e}")
+            return False
+
+    def _usable(self, slot: dict, browser) -> bool:
+        return (slot["browser"] is browser and browser.is_connected()
+                and not slot["crashed"] and not slot["page"].is_closed())
+
+    async def prewarm(self, browser, count: int):
+        count = min(count, self.size) - len(self._idle)
+        for _ in range(max(0, count)):
+            self._idle.append(await self._create(browser))
+
+    @asynccontextmanager
+    async def page(self, browser, viewport: Optional[dict] = None):
+        if self._sem.locked():
+            started = time.perf_counter()
+            await self._sem.acquire()
+            self.metrics["waits"] += 1
+            self.metrics["wait_ms_total"] += (time.perf_counter() - started) * 1000
+        else:
+            await self._sem.acquire()
+        self._in_use += 1
+        slot = None
+        ok = False
+        try:
+            while self._idle and slot is None:
+                candidate = self._idle.pop()
+                if self._usable(candidate, browser):
+                    slot = candidate
+                else:
+                    await self._discard(candidate)
+            if slot is not None:
+                self.metrics["hits"] += 1
+            else:
+                self.metrics["misses"] += 1
+                slot = await self._create(browser)
+            slot["uses"] += 1
+            if viewport:
+                await slot["page"].set_viewport_size(viewport)
+            yield slot["page"]
+            ok = True
+        finally:
+            try:
+                if slot is not None:
+                    if ok and not slot["crashed"] and slot["uses"] < self.max_uses and await self._reset(slot):
+                        self._idle.append(slot)
+                    else:
+                        self.metrics["crashed" if slot["crashed"] else "recycled"] += 1
+                        await self._discard(slot)
+            finally:
+                self._in_use -= 1
+                self._sem.release()
+
+    def stats(self) -> dict:
+        waits = self.metrics["waits"]
+        return {
+            **self.metrics,
+            "size": self.size,
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            "avg_wait_ms": round(self.metrics["wait_ms_total"] / waits, 2) if waits else 0.0,
+        }
+
+    async def close(self):
+        while self._idle:
+            await self._discard(self._idle.pop())
+
+
+# ----- Render scheduler (browser farm) -----
+RENDER_BROWSERS = int(os.environ.get('RENDER_BROWSERS', '0')) or os.cpu_count() or 1
+RENDER_MAX_IN_FLIGHT = int(os.environ.get('RENDER_MAX_IN_FLIGHT', '4'))
+RENDER_QUEUE_MAX = int(os.environ.get('RENDER_QUEUE_MAX', '32'))
+
+
+class RenderScheduler:
+    """Runs render jobs on N Chromium instances.
+
+    Each browser serves at most `max_in_flight` jobs through its own page pool.
+    Jobs that cannot start immediately wait in a priority queue (higher
+    priority first, FIFO within a priority); when the queue is full the caller
+    gets a 429 with Retry-After. A browser that disconnects is relaunched and
+    the interrupted job is retried once.
+    """
+
+    def __init__(self, browsers: int, max_in_flight: int, queue_max: int):
+        self.max_in_flight = max(1, max_in_flight)
+        self.queue_max = max(0, queue_max)
+        self._workers = [
+            {"index": i, "browser": None, "pool": PagePool(self.max_in_flight, RENDER_PAGE_MAX_USES),
+             "in_flight": 0, "restarts": 0, "lock": asyncio.Lock()}
+            for i in range(max(1, browsers))
+        ]
+        self._waiters: list = []
+        self._seq = 0
+        self._avg_job_ms = 1000.0
+        self.metrics = {"jobs": 0, "failed": 0, "retried": 0, "rejected": 0, "queued": 0}
+
+    def _free_worker(self) -> Optional[dict]:
+        free = [w for w in self._workers if w["in_flight"] < self.max_in_flight]
+        return min(free, key=lambda w: w["in_flight"]) if free else None
+
+    def retry_after(self) -> int:
+        capacity = len(self._workers) * self.max_in_flight
+        return max(1, int((len(self._waiters) + 1) * self._avg_job_ms / 1000 / capacity) + 1)
+
+    async def _acquire(self, priority: int) -> dict:
+        worker = None if self._waiters else self._free_worker()
+        if worker is not None:
+            worker["in_flight"] += 1
+            return worker
+        if len(self._waiters) >= self.queue_max:
+            self.metrics["rejected"] += 1
+            raise HTTPException(429, "Export kuyrugu dolu, lutfen tekrar deneyin",
+                                headers={"Retry-After": str(self.retry_after())})
+        self._seq += 1
+        entry = (-priority, self._seq, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, entry)
+        self.metrics["queued"] += 1
+        try:
+            return await entry[2]
+        except asyncio.CancelledError:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            elif entry[2].done() and not entry[2].cancelled():
+                self._release(entry[2].result())
+            raise
+
+    def _release(self, worker: dict):
+        worker["in_flight"] -= 1
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                worker["in_flight"] += 1
+                fut.set_result(worker)
+                return
+
+    async def _browser_for(self, worker: dict):
+        async with worker["lock"]:
+            browser = worker["browser"]
+            if browser is not None and browser.is_connected():
+                return browser
+            if browser is not None:
+                worker["restarts"] += 1
+                logger.warning(f"Render browser #{worker['index']} disconnected, relaunching")
+            try:
+                worker["browser"] = await launch_browser()
+            except Exception as e:
+                logger.error(f"Browser launch failed: {e}")
+                raise HTTPException(500, f"Playwright tarayici baslatilamadi: {str(e)}")
+            return worker["browser"]
+
+    async def run(self, job, viewport: Optional[dict] = None, priority: int = 0, retry: bool = True):
+        """Run `job(page)` on a pooled page and return its result.
+
+        Pass `retry=False` for jobs with side effects that cannot be replayed.
+        """
+        worker = await self._acquire(priority)
+        started = time.perf_counter()
+        try:
+            for attempt in (1, 2):
+                browser = await self._browser_for(worker)
+                try:
+                    async with worker["pool"].page(browser, viewport) as page:
+                        return await job(page)
+                except Exception as e:
+                    if retry and attempt == 1 and not browser.is_connected():
+                        self.metrics["retried"] += 1
+                        logger.warning(f"Render job interrupted by browser disconnect, retrying: {e}")
+                        continue
+                    self.metrics["failed"] += 1
+                    raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._avg_job_ms = 0.9 * self._avg_job_ms + 0.1 * elapsed_ms
+            self.metrics["jobs"] += 1
+            self._release(worker)
+
+    async def prewarm(self, pages: int):
+        worker = self._workers[0]
+        await worker["pool"].prewarm(await self._browser_for(worker), pages)
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "browsers": len(self._workers),
+            "max_in_flight": self.max_in_flight,
+            "queue_max": self.queue_max,
+            "queue_depth": len(self._waiters),
+            "avg_job_ms": round(self._avg_job_ms, 1),
+            "workers": [
+                {"index": w["index"], "connected": bool(w["browser"] and w["browser"].is_connected()),
+                 "in_flight": w["in_flight"], "restarts": w["restarts"], "page_pool": w["pool"].stats()}
+                for w in self._workers
+            ],
+        }
+
+    async def close(self):
+        for w in self._workers:
+            await w["pool"].close()
+            if w["browser"] is not None:
+                try:
+                    await w["browser"].close()
+                except Exception:
+                    pass
+                w["browser"] = None
+
+
+_render_scheduler = RenderScheduler(RENDER_BROWSERS, RENDER_MAX_IN_FLIGHT, RENDER_QUEUE_MAX)
+
+
+# ----- Render readiness -----
+# "auto" waits for fonts, decoded images and an optional template signal;
+# "fixed" keeps the legacy 300 ms delay.
+RENDER_READY_MODE = os.environ.get('RENDER_READY_MODE', 'auto')
+RENDER_READY_TIMEOUT_MS = int(os.environ.get('RENDER_READY_TIMEOUT_MS', '5000'))
+RENDER_FALLBACK_DELAY_MS = 300
+
+# Templates that draw asynchronously can opt in with `window.__RENDER_WAIT__ = true`
+# (or `<html data-render-wait>`) and then set `window.__RENDER_COMPLETE__ = true`
+# or dispatch a `render-complete` event on window.
+READY_SCRIPT = """async (timeoutMs) => {
+  const ready = (async () => {
+    if (document.fonts && document.fonts.ready) await document.fonts.ready;
+    await Promise.all(Array.from(document.images).map(img => img.decode ? img.decode().catch(() => null) : null));
+    const optIn = window.__RENDER_WAIT__ || document.documentElement.hasAttribute('data-render-wait');
+    if (optIn && !window.__RENDER_COMPLETE__) {
+      await new Promise(resolve => window.addEventListener('render-complete', resolve, { once: true }));
+    }
+    await new Promise(resolve => requestAnimationFrame(() => requestAnimationFrame(resolve)));
+    return 'ready';
+  })();
+  const timeout = new Promise(resolve => setTimeout(() => resolve('timeout'), timeoutMs));
+  return Promise.race([ready, timeout]);
+}"""
+
+
+class Histogram:
+    """Fixed-bucket latency histogram in milliseconds."""
+
+    BOUNDS_MS = (25, 50, 100, 200, 300, 500, 750, 1000, 2000, 5000, 10000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)
+        self.total_ms = 0.0
+        self.count = 0
+
+    def observe(self, ms: float):
+        idx = next((i for i, bound in enumerate(self.BOUNDS_MS) if ms <= bound), len(self.BOUNDS_MS))
+        self.counts[idx] += 1
+        self.total_ms += ms
+        self.count += 1
+
+    def stats(self) -> dict:
+        labels = [f"le_{b}" for b in self.BOUNDS_MS] + ["inf"]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+_render_histograms: Dict[str, Histogram] = {}
+_ready_outcomes: Dict[str, int] = {"ready": 0, "timeout": 0, "fallback": 0, "fixed": 0}
+
+
+def observe_render(name: str, ms: float):
+    _render_histograms.setdefault(name, Histogram()).observe(ms)
+
+
+async def wait_for_render_ready(page) -> str:
+    started = time.perf_counter()
+    if RENDER_READY_MODE == 'fixed':
+        await page.wait_for_timeout(RENDER_FALLBACK_DELAY_MS)
+        outcome = 'fixed'
+    else:
+        try:
+            outcome = await page.evaluate(READY_SCRIPT, RENDER_READY_TIMEOUT_MS)
+            if outcome == 'timeout':
+                logger.warning(f"Render readiness timed out after {RENDER_READY_TIMEOUT_MS} ms")
+        except Exception as e:
+            logger.warning(f"Render readiness check failed, using fixed delay: {e}")
+            await page.wait_for_timeout(RENDER_FALLBACK_DELAY_MS)
+            outcome = 'fallback'
+    _ready_outcomes[outcome] = _ready_outcomes.get(outcome, 0) + 1
+    observe_render('ready_wait', (time.perf_counter() - started) * 1000)
+    return outcome
+
+
+def render_metrics() -> dict:
+    return {
+        "ready_mode": RENDER_READY_MODE,
+        "ready_outcomes": dict(_ready_outcomes),
+        "histograms": {name: h.stats() for name, h in _render_histograms.items()},
+    }
+
+
+async def render_html_to_pdf(html_content: str, width_mm: int = 210, height_mm: int = 297, landscape: bool = False, priority: int = 0) -> bytes:
+    html_content = prepare_render_html(html_content, print_width_px(width_mm, height_mm, landscape))
+    async def job(page):
+        started = time.perf_counter()
         await page.set_content(html_content, wait_until='load', timeout=15000)
-        await page.wait_for_timeout(300)
+        await wait_for_render_ready(page)
         pdf_bytes = await page.pdf(
             width=f'{width_mm}mm',
             height=f'{height_mm}mm',
@@ -113,30 +465,979 @@ async def render_html_to_pdf(html_content: str, width_mm: int = 210, height_mm:
             landscape=landscape,
             margin={'top': '0mm', 'right': '0mm', 'bottom': '0mm', 'left': '0mm'}
         )
+        observe_render('pdf', (time.perf_counter() - started) * 1000)
         return pdf_bytes
-    finally:
-        await page.close()
+    return await _render_scheduler.run(job, priority=priority)
 
-async def render_html_to_image(html_content: str, width: int = 1080, height: int = 1080, quality: int = 90, img_format: str = 'png') -> bytes:
-    try:
-        browser = await get_browser()
-    except Exception as e:
-        logger.error(f"Browser launch failed: {e}")
-        raise HTTPException(500, f"Playwright tarayici baslatilamadi: {str(e)}")
-    page = await browser.new_page(viewport={'width': width, 'height': height})
-    try:
+async def render_html_to_image(html_content: str, width: int = 1080, height: int = 1080, quality: int = 90, img_format: str = 'png', priority: int = 0) -> bytes:
+    html_content = prepare_render_html(html_content, width)
+    async def job(page):
+        started = time.perf_counter()
         await page.set_content(html_content, wait_until='load', timeout=15000)
-        await page.wait_for_timeout(300)
-        if img_format == 'jpeg' or img_format == 'jpg':
-            screenshot = await page.screenshot(type='jpeg', quality=quality, full_page=False)
-        else:
-            screenshot = await page.screenshot(type='png', full_page=False)
+        await wait_for_render_ready(page)
+        screenshot = await _screenshot(page, img_format, quality)
+        observe_render('image', (time.perf_counter() - started) * 1000)
         return screenshot
-    finally:
-        await page.close()
+    return await _render_scheduler.run(job, viewport={'width': width, 'height': height}, priority=priority)
+
+# ----- Render once, rasterize many -----
+SETTLE_SCRIPT = "() => new Promise(resolve => requestAnimationFrame(() => requestAnimationFrame(resolve)))"
+
+
+def plan_raster_groups(targets: List[dict], shared: bool) -> List[List[int]]:
+    """Group target indices that can share one capture.
+
+    Without `shared` every target gets its own viewport screenshot. With it,
+    targets of the same aspect ratio collapse into one high-DPI capture.
+    """
+    if not shared:
+        return [[i] for i in range(len(targets))]
+    groups: Dict[tuple, List[int]] = {}
+    for i, t in enumerate(targets):
+        g = math.gcd(t['width'], t['height']) or 1
+        groups.setdefault((t['width'] // g, t['height'] // g), []).append(i)
+    return list(groups.values())
+
+
+def encode_raster(capture: bytes, width: int, height: int, img_format: str, quality: int) -> bytes:
+    img = Image.open(io.BytesIO(capture))
+    if img.size != (width, height):
+        img = img.resize((width, height), Image.LANCZOS)
+    output = io.BytesIO()
+    if img_format in ('jpeg', 'jpg'):
+        img.convert('RGB').save(output, format='JPEG', quality=quality)
+    else:
+        img.save(output, format='PNG')
+    return output.getvalue()
+
+
+async def _screenshot(page, img_format: str, quality: int) -> bytes:
+    if img_format == 'jpeg' or img_format == 'jpg':
+        return await page.screenshot(type='jpeg', quality=quality, full_page=False)
+    return await page.screenshot(type='png', full_page=False)
+
+
+async def render_html_to_images(html_content: str, targets: List[dict], shared_raster: bool = False, priority: int = 0) -> List[bytes]:
+    """Render one document into several image sizes.
+
+    `targets` are dicts with width, height, quality and img_format. The HTML is
+    parsed, decoded and laid out once; each size is then a viewport resize plus
+    screenshot. With `shared_raster`, same-aspect sizes come from a single
+    capture at the smallest viewport scaled up by device_scale_factor and are
+    Lanczos-downscaled in Pillow. Layouts with fixed pixel sizes look different
+    from the per-viewport path in that mode, so it is opt-in.
+    """
+    html_content = prepare_render_html(html_content, max(t['width'] for t in targets))
+    groups = plan_raster_groups(targets, shared_raster)
+
+    async def job(page):
+        started = time.perf_counter()
+        await page.set_content(html_content, wait_until='load', timeout=15000)
+        await wait_for_render_ready(page)
+        results: List[Optional[bytes]] = [None] * len(targets)
+        for group in groups:
+            if len(group) == 1:
+                t = targets[group[0]]
+                await page.set_viewport_size({'width': t['width'], 'height': t['height']})
+                await page.evaluate(SETTLE_SCRIPT)
+                results[group[0]] = await _screenshot(page, t['img_format'], t['quality'])
+                continue
+            base = min((targets[i] for i in group), key=lambda t: t['width'])
+            top = max((targets[i] for i in group), key=lambda t: t['width'])
+            context = await page.context.browser.new_context(
+                viewport={'width': base['width'], 'height': base['height']},
+                device_scale_factor=top['width'] / base['width'],
+            )
+            await context.route(f"{ASSET_HOST}/blob/**", serve_blob_route)
+            try:
+                hidpi = await context.new_page()
+                await hidpi.set_content(html_content, wait_until='load', timeout=15000)
+                await wait_for_render_ready(hidpi)
+                capture = await hidpi.screenshot(type='png', full_page=False)
+            finally:
+                await context.close()
+            for i in group:
+                t = targets[i]
+                results[i] = await _image_pool.run(encode_raster, capture, t['width'], t['height'], t['img_format'], t['quality'], bounded=False)
+        observe_render('image_multi', (time.perf_counter() - started) * 1000)
+        return results
+
+    first = targets[0]
+    return await _render_scheduler.run(job, viewport={'width': first['width'], 'height': first['height']}, priority=priority)
+
+# ----- Streaming PDF with deduplicated assets -----
+ASSET_HOST = "https://render-assets.local"
+DATA_URI_RE = re.compile(r'data:(image/[\w.+-]+);base64,([A-Za-z0-9+/=]+)')
+PDF_STREAM_CHUNK = 256 * 1024
+
+
+def externalize_data_uris(html_content: str):
+    """Replace inline base64 images with ASSET_HOST URLs, one entry per unique payload.
+
+    Returns (html, assets) where assets maps key -> (mime, bytes). Chromium then
+    fetches and decodes every distinct image once however often it repeats.
+    """
+    assets: Dict[str, tuple] = {}
+
+    def replace(m):
+        key = hashlib.sha1(m.group(2).encode('ascii')).hexdigest()
+        if key not in assets:
+            assets[key] = (m.group(1), base64.b64decode(m.group(2)))
+        return f"{ASSET_HOST}/{key}"
+
+    return DATA_URI_RE.sub(replace, html_content), assets
+
+
+async def render_html_to_pdf_stream(html_content: str, chunks: asyncio.Queue, width_mm: int = 210, height_mm: int = 297,
+                                    landscape: bool = False, assets: Optional[Dict[str, tuple]] = None, priority: int = 0):
+    """Print a PDF and push it into `chunks` piece by piece as Chromium produces it."""
+    html_content = prepare_render_html(html_content, print_width_px(width_mm, height_mm, landscape))
+    assets = assets or {}
+
+    async def serve_asset(route):
+        asset = assets.get(route.request.url.rsplit('/', 1)[-1])
+        if asset is None:
+            await route.fallback()
+            return
+        await route.fulfill(status=200, content_type=asset[0], body=asset[1])
+
+    async def job(page):
+        started = time.perf_counter()
+        await page.route(f"{ASSET_HOST}/**", serve_asset)
+        try:
+            await page.set_content(html_content, wait_until='load', timeout=60000)
+            await wait_for_render_ready(page)
+            cdp = await page.context.new_cdp_session(page)
+            try:
+                printed = await cdp.send('Page.printToPDF', {
+                    'paperWidth': width_mm / 25.4, 'paperHeight': height_mm / 25.4, 'landscape': landscape,
+                    'printBackground': True, 'preferCSSPageSize': True,
+                    'marginTop': 0, 'marginBottom': 0, 'marginLeft': 0, 'marginRight': 0,
+                    'transferMode': 'ReturnAsStream',
+                })
+                handle = printed['stream']
+                while True:
+                    piece = await cdp.send('IO.read', {'handle': handle, 'size': PDF_STREAM_CHUNK})
+                    data = base64.b64decode(piece['data']) if piece.get('base64Encoded') else piece['data'].encode('utf-8')
+                    if data:
+                        await chunks.put(data)
+                    if piece.get('eof'):
+                        break
+                await cdp.send('IO.close', {'handle': handle})
+            finally:
+                await cdp.detach()
+        finally:
+            await page.unroute(f"{ASSET_HOST}/**", serve_asset)
+        observe_render('pdf_stream', (time.perf_counter() - started) * 1000)
+
+    # Chunks may already be on the wire, so a browser crash cannot be replayed
+    await _render_scheduler.run(job, priority=priority, retry=False)
+
+# ==================== CPU WORKER POOLS ====================
+# rembg/ONNX inference runs in worker processes, Pillow decode/resize/encode in
+# threads (Pillow releases the GIL for those). Request handlers are rejected with
+# 429 once a pool's queue is full; export pipelines that were already admitted
+# by the render scheduler wait instead.
+IMAGE_THREADS = int(os.environ.get('IMAGE_THREADS', str(min(8, os.cpu_count() or 2))))
+IMAGE_QUEUE_MAX = int(os.environ.get('IMAGE_QUEUE_MAX', '64'))
+REMBG_PROCESSES = int(os.environ.get('REMBG_PROCESSES', '1'))
+REMBG_QUEUE_MAX = int(os.environ.get('REMBG_QUEUE_MAX', '8'))
+REMBG_MODEL = os.environ.get('REMBG_MODEL', 'u2net')
+REMBG_MODELS = [m.strip() for m in os.environ.get('REMBG_MODELS', 'u2net,u2netp,u2net_human_seg,silueta,isnet-general-use').split(',') if m.strip()]
+REMBG_PRELOAD = os.environ.get('REMBG_PRELOAD', '1') == '1'
+REMBG_THREADS = int(os.environ.get('REMBG_THREADS', str(max(1, (os.cpu_count() or 1) // max(1, REMBG_PROCESSES)))))
+REMBG_BATCH_MAX = int(os.environ.get('REMBG_BATCH_MAX', '50'))
+LOOP_LAG_INTERVAL_MS = 100
+
+
+class CpuPool:
+    """Executor with a bounded queue and run-time histogram."""
+
+    def __init__(self, name: str, make_executor, workers: int, queue_max: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_max = max(0, queue_max)
+        self._make_executor = make_executor
+        self._executor = None
+        self._pending = 0
+        self._run_ms = Histogram()
+        self.metrics = {"submitted": 0, "rejected": 0, "failed": 0}
+
+    def executor(self):
+        if self._executor is None:
+            self._executor = self._make_executor(self.workers)
+        return self._executor
+
+    async def run(self, fn, *args, bounded: bool = True):
+        if bounded and self._pending >= self.workers + self.queue_max:
+            self.metrics["rejected"] += 1
+            raise HTTPException(429, "Islem kuyrugu dolu, lutfen tekrar deneyin", headers={"Retry-After": "2"})
+        self._pending += 1
+        self.metrics["submitted"] += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor(), functools.partial(fn, *args))
+        except Exception:
+            self.metrics["failed"] += 1
+            raise
+        finally:
+            self._pending -= 1
+            self._run_ms.observe((time.perf_counter() - start) * 1000)
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics, "workers": self.workers, "queue_max": self.queue_max,
+            "pending": self._pending, "run_ms": self._run_ms.stats(),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_image_pool = CpuPool("image", lambda n: ThreadPoolExecutor(n, thread_name_prefix="image"), IMAGE_THREADS, IMAGE_QUEUE_MAX)
+_rembg_pool = CpuPool(
+    "rembg", lambda n: ProcessPoolExecutor(
+        n, mp_context=multiprocessing.get_context("spawn"), initializer=image_worker.init_worker,
+        initargs=(REMBG_THREADS, [REMBG_MODEL] if REMBG_PRELOAD else []),
+    ),
+    REMBG_PROCESSES, REMBG_QUEUE_MAX,
+)
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic sleep wakes up, i.e. how long the event loop was blocked."""
+
+    def __init__(self, interval_ms: int):
+        self.interval = interval_ms / 1000
+        self._lag_ms = Histogram()
+        self.max_ms = 0.0
+        self.blocked_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, (time.perf_counter() - start - self.interval) * 1000)
+            self._lag_ms.observe(lag)
+            self.max_ms = max(self.max_ms, lag)
+            self.blocked_ms += lag
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"lag_ms": self._lag_ms.stats(), "max_ms": round(self.max_ms, 1), "blocked_ms_total": round(self.blocked_ms, 1)}
+
+
+_loop_monitor = LoopLagMonitor(LOOP_LAG_INTERVAL_MS)
+
+# ==================== BLOB STORE ====================
+# Binary images live on disk keyed by SHA-256; documents only hold "/api/blobs/<hash>" refs.
+BLOBS_DIR = Path(os.environ.get('BLOBS_DIR', str(ROOT_DIR / "blobs")))
+BLOB_REF_PREFIX = "/api/blobs/"
+BLOB_REF_RE = re.compile(r'(?:https?://[^\s"\'()<>]*?)?/api/blobs/([0-9a-f]{64})')
+BLOB_REF_W_RE = re.compile(BLOB_REF_RE.pattern + r'(?:\?w=\d+)?')
+DATA_URI_VALUE_RE = re.compile(r'^data:(image/[\w.+-]+);base64,', re.I)
+BLOB_HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def sniff_image_mime(data: bytes) -> str:
+    if data.startswith(b'\x89PNG'):
+        return 'image/png'
+    if data.startswith(b'\xff\xd8'):
+        return 'image/jpeg'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'image/avif'
+    if b'<svg' in data[:1024]:
+        return 'image/svg+xml'
+    return 'application/octet-stream'
+
+
+def blob_path(blob_hash: str) -> Path:
+    return BLOBS_DIR / blob_hash[:2] / blob_hash
+
+
+def blob_ref(blob_hash: str) -> str:
+    return f"{BLOB_REF_PREFIX}{blob_hash}"
+
+
+async def put_blob(data: bytes, mime: Optional[str] = None, derive: bool = False) -> str:
+    """Store bytes once under their SHA-256 and return the hash.
+
+    With `derive`, resized derivatives are generated in the background.
+    """
+    blob_hash = hashlib.sha256(data).hexdigest()
+    path = blob_path(blob_hash)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{blob_hash}.{uuid.uuid4().hex}.tmp")
+        async with aiofiles.open(tmp, 'wb') as f:
+            await f.write(data)
+        os.replace(tmp, path)
+    now = datetime.now(timezone.utc).isoformat()
+    # touched_at protects a blob that was just (re)uploaded or re-referenced from garbage collection.
+    await db.blobs.update_one(
+        {"hash": blob_hash},
+        {"$setOnInsert": {"hash": blob_hash, "mime": mime or sniff_image_mime(data), "size": len(data), "created_at": now},
+         "$set": {"touched_at": now}},
+        upsert=True,
+    )
+    if derive:
+        schedule_derivatives(blob_hash)
+    return blob_hash
+
+
+async def touch_blobs(blob_hashes: List[str]) -> int:
+    """Restart the GC grace period of existing blobs that are handed out again; returns how many were found."""
+    if not blob_hashes:
+        return 0
+    result = await db.blobs.update_many({"hash": {"$in": list(blob_hashes)}},
+                                        {"$set": {"touched_at": datetime.now(timezone.utc).isoformat()}})
+    return result.matched_count
+
+
+async def read_blob(blob_hash: str) -> bytes:
+    if not BLOB_HASH_RE.match(blob_hash):
+        raise ValueError(f"Invalid blob hash: {blob_hash}")
+    async with aiofiles.open(blob_path(blob_hash), 'rb') as f:
+        return await f.read()
+
+
+async def store_data_uri(value: str) -> str:
+    """Turn a base64 image data URI into a blob ref; other strings pass through."""
+    m = DATA_URI_VALUE_RE.match(value)
+    if not m:
+        return value
+    data = base64.b64decode(value[m.end():])
+    return blob_ref(await put_blob(data, m.group(1).lower(), derive=True))
+
+
+async def externalize_images(obj):
+    """Recursively replace inline data-URI images in a document with blob refs."""
+    if isinstance(obj, str):
+        return await store_data_uri(obj) if obj.startswith('data:') else obj
+    if isinstance(obj, list):
+        return [await externalize_images(v) for v in obj]
+    if isinstance(obj, dict):
+        return {k: await externalize_images(v) for k, v in obj.items()}
+    return obj
+
+
+async def inline_images(obj):
+    """Inverse of externalize_images: blob refs become data URIs again (self-contained backups)."""
+    if isinstance(obj, str):
+        m = BLOB_REF_RE.fullmatch(obj)
+        if not m:
+            return obj
+        try:
+            data = await read_blob(m.group(1))
+        except (OSError, ValueError):
+            logger.warning(f"Blob missing while inlining: {m.group(1)}")
+            return obj
+        return f"data:{sniff_image_mime(data)};base64,{base64.b64encode(data).decode('utf-8')}"
+    if isinstance(obj, list):
+        return [await inline_images(v) for v in obj]
+    if isinstance(obj, dict):
+        return {k: await inline_images(v) for k, v in obj.items()}
+    return obj
+
+
+def prepare_render_html(html_content: str, target_width: Optional[int] = None) -> str:
+    """Point blob refs at the render asset host; the page context serves them from disk.
+
+    With `target_width` (output width in device pixels) each image is served
+    as the smallest derivative at least that wide. Width hints already in the
+    HTML (editor preview) are replaced.
+    """
+    suffix = f"?w={target_width}" if target_width else ""
+    return BLOB_REF_W_RE.sub(lambda m: f"{ASSET_HOST}/blob/{m.group(1)}{suffix}", html_content)
+
+
+def print_width_px(width_mm: float, height_mm: float, landscape: bool = False) -> int:
+    return round((max(width_mm, height_mm) if landscape else width_mm) / 25.4 * RENDER_PRINT_DPI)
+
+
+async def serve_blob_route(route):
+    url = urlsplit(route.request.url)
+    width = parse_qs(url.query).get('w', [''])[0]
+    try:
+        blob_hash = url.path.rsplit('/', 1)[-1]
+        if width.isdigit():
+            blob_hash = await pick_derivative(blob_hash, int(width))
+        data = await read_blob(blob_hash)
+    except (OSError, ValueError):
+        await route.abort()
+        return
+    await route.fulfill(status=200, content_type=sniff_image_mime(data), body=data)
+
+
+# ----- Derivatives -----
+# Each raster blob gets downscaled copies (thumbnail, editor preview, print) stored
+# as blobs of their own and listed on the original's db.blobs record.
+IMAGE_DERIVATIVE_WIDTHS = sorted({int(w) for w in os.environ.get('IMAGE_DERIVATIVE_WIDTHS', '320,1280,2480').split(',') if w.strip()})
+IMAGE_DERIVATIVE_FORMAT = os.environ.get('IMAGE_DERIVATIVE_FORMAT', 'webp').lower()
+Image.init()
+if IMAGE_DERIVATIVE_FORMAT not in ('webp', 'jpeg') and not (IMAGE_DERIVATIVE_FORMAT == 'avif' and 'AVIF' in Image.SAVE):
+    IMAGE_DERIVATIVE_FORMAT = 'webp'
+RENDER_PRINT_DPI = int(os.environ.get('RENDER_PRINT_DPI', '300'))
+DERIVABLE_MIMES = {'image/jpeg', 'image/png', 'image/webp'}
+DERIVATIVE_MIMES = {'webp': 'image/webp', 'avif': 'image/avif', 'jpeg': 'image/jpeg'}
+
+_derivative_tasks: Dict[str, asyncio.Task] = {}
+
+
+def encode_derivative(img: Image.Image, fmt: str) -> bytes:
+    has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+    img = img.convert('RGBA' if has_alpha else 'RGB')
+    output = io.BytesIO()
+    if fmt == 'avif':
+        img.save(output, format='AVIF', quality=70)
+    elif fmt == 'jpeg' and not has_alpha:
+        img.save(output, format='JPEG', quality=85, optimize=True, progressive=True)
+    else:
+        img.save(output, format='WEBP', quality=82, method=4)
+    return output.getvalue()
+
+
+def make_derivatives(data: bytes, widths: List[int], fmt: str):
+    """Return (source_width, source_height, [(width, height, bytes)]) for every width below the source."""
+    img = open_image(data)
+    src_w, src_h = oriented_size(img)
+    wanted = [w for w in widths if w < src_w]
+    if not wanted:
+        return src_w, src_h, []
+    img = load_scaled(img, wanted[-1], max(1, round(src_h * wanted[-1] / src_w)))
+    out = []
+    # Largest first; each smaller size is resampled from the previous one.
+    for w in reversed(wanted):
+        size = (w, max(1, round(src_h * w / src_w)))
+        if img.size != size:
+            img = img.resize(size, Image.LANCZOS, reducing_gap=3.0)
+        out.append((size[0], size[1], encode_derivative(img, fmt)))
+    return src_w, src_h, out
+
+
+async def build_derivatives(blob_hash: str) -> List[dict]:
+    doc = await db.blobs.find_one({"hash": blob_hash}, {"_id": 0, "mime": 1, "derivatives": 1})
+    if doc and "derivatives" in doc:
+        return doc["derivatives"]
+    data = await read_blob(blob_hash)
+    derivatives, fields = [], {}
+    fmt = IMAGE_DERIVATIVE_FORMAT
+    if sniff_image_mime(data) in DERIVABLE_MIMES:
+        try:
+            src_w, src_h, outputs = await _image_pool.run(make_derivatives, data, IMAGE_DERIVATIVE_WIDTHS, fmt, bounded=False)
+        except (HTTPException, OSError):
+            # Undecodable or oversized: serve the original for every width.
+            outputs, src_w, src_h = [], None, None
+        fields = {"width": src_w, "height": src_h}
+        for w, h, out in outputs:
+            d_hash = await put_blob(out, DERIVATIVE_MIMES[fmt])
+            await db.blobs.update_one({"hash": d_hash}, {"$set": {"derivatives": [], "derived_from": blob_hash}})
+            derivatives.append({"width": w, "height": h, "hash": d_hash, "mime": DERIVATIVE_MIMES[fmt]})
+    derivatives.sort(key=lambda d: d["width"])
+    await db.blobs.update_one({"hash": blob_hash}, {"$set": {**fields, "derivatives": derivatives}}, upsert=True)
+    return derivatives
+
+
+async def ensure_derivatives(blob_hash: str) -> List[dict]:
+    """Derivative list for a blob, generating it on first use; concurrent callers share one build."""
+    task = _derivative_tasks.get(blob_hash)
+    if task is None:
+        task = asyncio.create_task(build_derivatives(blob_hash))
+        _derivative_tasks[blob_hash] = task
+        task.add_done_callback(lambda _: _derivative_tasks.pop(blob_hash, None))
+    return await asyncio.shield(task)
+
+
+def schedule_derivatives(blob_hash: str):
+    def log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logger.warning(f"Derivative build failed for {blob_hash}: {task.exception()}")
+    asyncio.ensure_future(ensure_derivatives(blob_hash)).add_done_callback(log_failure)
+
+
+async def pick_derivative(blob_hash: str, width: int) -> str:
+    """Smallest derivative at least `width` px wide, else the original."""
+    if not BLOB_HASH_RE.match(blob_hash):
+        raise ValueError(f"Invalid blob hash: {blob_hash}")
+    for d in await ensure_derivatives(blob_hash):
+        if d["width"] >= width:
+            return d["hash"]
+    return blob_hash
+
+
+# ----- Near-duplicates -----
+# Exact copies collapse onto one blob via SHA-256. Visually identical images
+# with different bytes (re-saved, recompressed, slightly resized) are flagged
+# with a 64-bit difference hash: similar images differ in few bits. The hash
+# is split into 8 one-byte bands; two hashes within 7 bits share at least one
+# band, so candidates come from an indexed exact match on any band.
+IMAGE_PHASH = os.environ.get('IMAGE_PHASH', '1') == '1'
+IMAGE_SIMILAR_DISTANCE = min(int(os.environ.get('IMAGE_SIMILAR_DISTANCE', '6')), 7)
+IMAGE_SIMILAR_LIMIT = 5
+
+
+def perceptual_hash(source) -> str:
+    """dHash: compare neighbouring pixels of a 9x8 grayscale thumbnail."""
+    img = open_image(source)
+    src_w, src_h = oriented_size(img)
+    img = load_scaled(img, min(src_w, 64), min(src_h, 64)).convert('L').resize((9, 8), Image.BOX)
+    px = list(img.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return f"{value:016x}"
+
+
+def phash_bands(phash: str) -> List[str]:
+    return [f"{i}:{phash[i * 2:i * 2 + 2]}" for i in range(8)]
+
+
+def phash_distance(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+async def similar_blobs(blob_hash: str, phash: str) -> List[dict]:
+    found = []
+    cursor = db.blobs.find({"phash_bands": {"$in": phash_bands(phash)}, "hash": {"$ne": blob_hash}},
+                           {"_id": 0, "hash": 1, "phash": 1})
+    async for doc in cursor:
+        distance = phash_distance(phash, doc["phash"])
+        if distance <= IMAGE_SIMILAR_DISTANCE:
+            found.append({"hash": doc["hash"], "distance": distance})
+    found.sort(key=lambda d: d["distance"])
+    found = found[:IMAGE_SIMILAR_LIMIT]
+    # The client may swap the upload for one of these, so they must survive a concurrent GC.
+    await touch_blobs([d["hash"] for d in found])
+    return [{"image_data": blob_ref(d["hash"]), "distance": d["distance"]} for d in found]
+
+
+async def ingest_image(data: bytes, mime: str) -> dict:
+    """Store an uploaded image, reporting whether it already existed and which stored images look the same."""
+    blob_hash = hashlib.sha256(data).hexdigest()
+    existing = await db.blobs.find_one({"hash": blob_hash}, {"_id": 0, "phash": 1})
+    duplicate = existing is not None and blob_path(blob_hash).is_file()
+    await put_blob(data, mime, derive=True)
+    similar = []
+    phash = (existing or {}).get("phash")
+    if IMAGE_PHASH and sniff_image_mime(data) in DERIVABLE_MIMES:
+        if phash is None:
+            try:
+                phash = await _image_pool.run(perceptual_hash, data, bounded=False)
+            except HTTPException:
+                phash = None
+            if phash:
+                await db.blobs.update_one({"hash": blob_hash}, {"$set": {"phash": phash, "phash_bands": phash_bands(phash)}})
+        if phash:
+            similar = await similar_blobs(blob_hash, phash)
+    return {"image_data": blob_ref(blob_hash), "duplicate": duplicate, "similar": similar}
+
+
+# ----- Reference counts -----
+# Documents reference blobs only through "/api/blobs/<hash>" strings, so counts
+# are recomputed by scanning every collection that can hold refs, plus the HTML
+# files of unfinished export jobs. A blob is deleted only if nothing references
+# it, its original (for derivatives) is unreferenced too, and it was not touched
+# within the grace period. Uploads touch a blob, and so does handing an existing
+# one out again (duplicate upload, similar-image match, backup import, cached
+# background removal) - the document using it may be saved some time later.
+# The delete is conditional on touched_at, so a blob touched mid-sweep is kept.
+BLOB_REF_COLLECTIONS = ("catalogs", "cards", "assets", "themes", "export_jobs")
+BLOB_GC_GRACE_HOURS = int(os.environ.get('BLOB_GC_GRACE_HOURS', '24'))
+
+
+async def count_blob_refs() -> Dict[str, int]:
+    """Number of documents referencing each blob."""
+    counts: Dict[str, int] = {}
+    for coll_name in BLOB_REF_COLLECTIONS:
+        async for doc in db[coll_name].find({}, {"_id": 0}):
+            for blob_hash in set(BLOB_REF_RE.findall(json.dumps(doc, default=str))):
+                counts[blob_hash] = counts.get(blob_hash, 0) + 1
+    for path in EXPORT_JOBS_DIR.glob("*.html"):
+        try:
+            html = await asyncio.to_thread(path.read_text, encoding='utf-8')
+        except OSError:
+            continue
+        for blob_hash in set(BLOB_REF_RE.findall(html)):
+            counts[blob_hash] = counts.get(blob_hash, 0) + 1
+    return counts
+
+
+async def collect_blob_garbage(dry_run: bool = True) -> dict:
+    """Store fresh reference counts on db.blobs and delete unreferenced blobs past the grace period."""
+    counts = await count_blob_refs()
+    cutoff = (datetime.now(timezone.utc) - timedelta(hours=BLOB_GC_GRACE_HOURS)).isoformat()
+    counted_at = datetime.now(timezone.utc).isoformat()
+    blobs = await db.blobs.find({}, {"_id": 0, "hash": 1, "derived_from": 1, "size": 1, "refs": 1}).to_list(None)
+    known = {b["hash"] for b in blobs}
+    updates = [UpdateOne({"hash": b["hash"]}, {"$set": {"refs": counts.get(b["hash"], 0), "refs_counted_at": counted_at}})
+               for b in blobs if b.get("refs") != counts.get(b["hash"], 0)]
+    if updates:
+        await db.blobs.bulk_write(updates, ordered=False)
+
+    def unreferenced(b):
+        if b.get("derived_from") in known:
+            return counts.get(b["derived_from"], 0) == 0 and counts.get(b["hash"], 0) == 0
+        return counts.get(b["hash"], 0) == 0
+
+    orphans = [b for b in blobs if unreferenced(b)]
+    deleted, freed = set(), 0
+    if not dry_run:
+        # Originals first: a derivative goes only together with its original.
+        for b in sorted(orphans, key=lambda b: b.get("derived_from") in known):
+            if b.get("derived_from") in known and b["derived_from"] not in deleted:
+                continue
+            result = await db.blobs.delete_one({"hash": b["hash"], "touched_at": {"$not": {"$gte": cutoff}}})
+            if result.deleted_count:
+                blob_path(b["hash"]).unlink(missing_ok=True)
+                deleted.add(b["hash"])
+                freed += b.get("size", 0)
+    return {
+        "blobs": len(blobs),
+        "referenced": sum(1 for b in blobs if counts.get(b["hash"], 0)),
+        "missing": sorted(h for h in counts if h not in known),
+        "unreferenced": len(orphans),
+        "unreferenced_bytes": sum(b.get("size", 0) for b in orphans),
+        "deleted": len(deleted),
+        "freed_bytes": freed,
+        "dry_run": dry_run,
+    }
+
+
+MIGRATION_FIELDS = {"catalogs": "pages", "cards": "content", "assets": "data"}
+
+
+async def migrate_inline_images():
+    """Move existing data-URI images out of catalogs, cards and assets into the blob store.
+
+    Each document is rewritten only if it has not changed since it was read,
+    so concurrent edits are never overwritten; skipped documents are retried
+    on the next startup.
+    """
+    migrated = 0
+    for coll_name, field in MIGRATION_FIELDS.items():
+        coll = db[coll_name]
+        cursor = coll.find({}, {"_id": 0, "id": 1, "updated_at": 1, field: 1})
+        async for doc in cursor:
+            value = doc.get(field)
+            if value is None or 'data:image' not in json.dumps(value):
+                continue
+            new_value = await externalize_images(value)
+            result = await coll.update_one({"id": doc["id"], "updated_at": doc.get("updated_at")}, {"$set": {field: new_value}})
+            migrated += result.modified_count
+    if migrated:
+        logger.info(f"Blob migration: {migrated} document(s) converted")
+
+# ==================== DATABASE INDEXES ====================
+INDEXES = {
+    "catalogs": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("updated_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("tags", ASCENDING)], {}),
+        ([("search_keys", ASCENDING)], {}),
+    ],
+    "cards": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("updated_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("card_type", ASCENDING), ("updated_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("search_keys", ASCENDING)], {}),
+    ],
+    "assets": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("created_at", DESCENDING)], {}),
+        ([("category", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("search_keys", ASCENDING)], {}),
+    ],
+    "themes": [([("id", ASCENDING)], {"unique": True})],
+    "glossary": [([("id", ASCENDING)], {"unique": True}), ([("locked", ASCENDING)], {})],
+    "export_history": [([("created_at", DESCENDING)], {})],
+    "export_jobs": [([("id", ASCENDING)], {"unique": True}), ([("status", ASCENDING)], {})],
+    "blobs": [([("hash", ASCENDING)], {"unique": True}), ([("phash_bands", ASCENDING)], {"sparse": True})],
+    "meta": [([("id", ASCENDING)], {"unique": True})],
+    # last_hit_at is a BSON date (not an ISO string) so the TTL monitor can expire idle entries.
+    "translations": [([("key", ASCENDING)], {"unique": True}),
+                     ([("last_hit_at", ASCENDING)], {"expireAfterSeconds": int(os.environ.get('TRANSLATION_CACHE_TTL_DAYS', '90')) * 86400})],
+}
+
+def index_name(keys) -> str:
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+async def ensure_indexes() -> Dict[str, List[str]]:
+    """Create every declared index; existing ones are left untouched, failures are logged."""
+    failed = {}
+    for coll_name, specs in INDEXES.items():
+        for keys, options in specs:
+            try:
+                await db[coll_name].create_index(keys, name=index_name(keys), **options)
+            except OperationFailure as e:
+                failed.setdefault(coll_name, []).append(index_name(keys))
+                logger.warning(f"Index {coll_name}.{index_name(keys)} not created: {e}")
+    return failed
+
+# Turkish letters fold to their ASCII base so "ISIK", "Işık" and "isik" match each other.
+SEARCH_FOLD = str.maketrans("İIıŞşĞğÜüÖöÇçÂâÎîÛû", "iiissgguuooccaaiiuu")
+SEARCH_FIELDS = {"catalogs": ("name", "product_name"), "cards": ("name",), "assets": ("name",)}
+
+def search_tokens(text: str) -> List[str]:
+    return re.findall(r'\w+', (text or "").translate(SEARCH_FOLD).lower())
+
+def search_keys(doc: dict, fields) -> List[str]:
+    return sorted({t for f in fields for t in search_tokens(doc.get(f) or "")})
+
+def search_filter(search: str) -> dict:
+    """Every search word must prefix-match a key; anchored regexes become index range scans."""
+    tokens = search_tokens(search)
+    if not tokens:
+        return {}
+    return {"$and": [{"search_keys": {"$regex": f"^{re.escape(t)}"}} for t in tokens]}
+
+async def backfill_search_keys():
+    updated = 0
+    for coll_name, fields in SEARCH_FIELDS.items():
+        coll = db[coll_name]
+        cursor = coll.find({"search_keys": {"$exists": False}}, {"_id": 0, "id": 1, **{f: 1 for f in fields}})
+        async for doc in cursor:
+            result = await coll.update_one({"id": doc["id"]}, {"$set": {"search_keys": search_keys(doc, fields)}})
+            updated += result.modified_count
+    if updated:
+        logger.info(f"Search keys backfilled for {updated} document(s)")
+
+def summarize_plan(plan: dict) -> dict:
+    stages, indexes = [], []
+    node = plan.get("queryPlan", plan)
+    while node:
+        stages.append(node.get("stage"))
+        if node.get("indexName"):
+            indexes.append(node["indexName"])
+        node = node.get("inputStage") or (node.get("inputStages") or [None])[0]
+    return {"stages": stages, "indexes": indexes, "collscan": "COLLSCAN" in stages}
+
+HOT_QUERIES = {
+    "catalog_by_id": ("catalogs", {"id": ""}, None),
+    "catalog_list": ("catalogs", {}, {"updated_at": -1, "id": -1}),
+    "catalog_search": ("catalogs", search_filter("vana"), {"updated_at": -1, "id": -1}),
+    "catalog_by_tag": ("catalogs", {"tags": ""}, {"updated_at": -1, "id": -1}),
+    "card_list": ("cards", {"card_type": "greeting"}, {"updated_at": -1, "id": -1}),
+    "asset_list": ("assets", {"category": "logo"}, {"created_at": -1}),
+    "export_history": ("export_history", {}, {"created_at": -1}),
+}
+
+# ==================== DISK CACHE ====================
+class DiskCache:
+    """Content-addressed results on disk with an in-memory LRU index.
+
+    Files are written to a temp name and renamed into place, so concurrent
+    writers never expose partial files. The index is rebuilt from the
+    directory (oldest mtime first) on startup, and hits touch the file so the
+    LRU order survives restarts. Identical renders in flight are coalesced.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, max_entries: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._index: "OrderedDict[str, dict]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.metrics = {"hits": 0, "misses": 0, "coalesced": 0, "stores": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.max_entries > 0
+
+    def load_index(self):
+        if not self.enabled:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        files = []
+        for path in self.directory.iterdir():
+            if path.suffix == '.tmp':
+                path.unlink(missing_ok=True)
+            elif path.is_file():
+                st = path.stat()
+                files.append((st.st_mtime, path, st.st_size))
+        for _, path, size in sorted(files):
+            self._index[path.stem] = {"path": path, "size": size}
+            self._bytes += size
+        self._evict()
+        logger.info(f"Cache {self.directory} loaded: {len(self._index)} entries, {self._bytes} bytes")
+
+    def _drop(self, key: str):
+        entry = self._index.pop(key, None)
+        if entry:
+            self._bytes -= entry["size"]
+            entry["path"].unlink(missing_ok=True)
+
+    def discard(self, key: str):
+        self._drop(key)
+
+    def _evict(self):
+        while self._index and (self._bytes > self.max_bytes or len(self._index) > self.max_entries):
+            self._drop(next(iter(self._index)))
+            self.metrics["evictions"] += 1
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._index.get(key) if self.enabled else None
+        if entry is None:
+            return None
+        try:
+            async with aiofiles.open(entry["path"], 'rb') as f:
+                data = await f.read()
+            os.utime(entry["path"])
+        except OSError:
+            self._drop(key)
+            return None
+        self._index.move_to_end(key)
+        return data
+
+    async def put(self, key: str, ext: str, data: bytes):
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        path = self.directory / f"{key}.{ext}"
+        tmp = self.directory / f"{key}.{uuid.uuid4().hex}.tmp"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            async with aiofiles.open(tmp, 'wb') as f:
+                await f.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Cache write failed ({self.directory}): {e}")
+            tmp.unlink(missing_ok=True)
+            return
+        old = self._index.pop(key, None)
+        if old:
+            self._bytes -= old["size"]
+        self._index[key] = {"path": path, "size": len(data)}
+        self._bytes += len(data)
+        self.metrics["stores"] += 1
+        self._evict()
+
+    async def _render_and_store(self, key: str, ext: str, render) -> bytes:
+        data = await render()
+        await self.put(key, ext, data)
+        return data
+
+    async def get_or_render(self, key: str, ext: str, render):
+        """Return (data, hit). `render` is an async callable producing the bytes."""
+        data = await self.get(key)
+        if data is not None:
+            self.metrics["hits"] += 1
+            return data, True
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.metrics["coalesced"] += 1
+            return await asyncio.shield(pending), True
+        self.metrics["misses"] += 1
+        task = asyncio.create_task(self._render_and_store(key, ext, render))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task), False
+
+    def stats(self) -> dict:
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "enabled": self.enabled,
+            "entries": len(self._index),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round(self.metrics["hits"] / lookups, 3) if lookups else 0.0,
+        }
+
+
+class MemoryLRU:
+    """Byte-budgeted in-memory LRU of bytes values."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self.metrics = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self._items.get(key)
+        if data is None:
+            self.metrics["misses"] += 1
+            return None
+        self._items.move_to_end(key)
+        self.metrics["hits"] += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._items[key] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, dropped = self._items.popitem(last=False)
+            self._bytes -= len(dropped)
+            self.metrics["evictions"] += 1
+
+    def discard(self, key: str):
+        data = self._items.pop(key, None)
+        if data is not None:
+            self._bytes -= len(data)
+
+    def stats(self) -> dict:
+        return {**self.metrics, "entries": len(self._items), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+class TieredCache(DiskCache):
+    """DiskCache with a MemoryLRU in front; disk hits are promoted to memory."""
+
+    def __init__(self, directory: Path, max_bytes: int, max_entries: int, memory_bytes: int):
+        super().__init__(directory, max_bytes, max_entries)
+        self.memory = MemoryLRU(memory_bytes)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        data = self.memory.get(key)
+        if data is None:
+            data = await super().get(key)
+            if data is not None:
+                self.memory.put(key, data)
+        return data
+
+    async def put(self, key: str, ext: str, data: bytes):
+        self.memory.put(key, data)
+        await super().put(key, ext, data)
+
+    def discard(self, key: str):
+        self.memory.discard(key)
+        super().discard(key)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "memory": self.memory.stats()}
 
 # ==================== BG REMOVAL CACHE ====================
-_bg_cache: Dict[str, str] = {}
+# Masks (the rembg inference output) are keyed by the upload hash only, so every
+# feather/shadow variant of the same photo reuses one inference. Results are
+# keyed by the md5-plus-params cache_key and only hold the blob ref and size.
+# Blob GC does not count these refs, so a result whose blob was collected is
+# treated as a miss and rendered again.
+BG_CACHE_DIR = Path(os.environ.get('BG_CACHE_DIR', str(EXPORTS_DIR / "bg-cache")))
+BG_CACHE_MEMORY_BYTES = int(os.environ.get('BG_CACHE_MEMORY_MB', '64')) * 1024 * 1024
+BG_CACHE_DISK_BYTES = int(os.environ.get('BG_CACHE_DISK_MB', '1024')) * 1024 * 1024
+
+_bg_mask_cache = TieredCache(BG_CACHE_DIR / "masks", BG_CACHE_DISK_BYTES, 100000, BG_CACHE_MEMORY_BYTES)
+_bg_result_cache = TieredCache(BG_CACHE_DIR / "results", BG_CACHE_DISK_BYTES // 64, 100000, BG_CACHE_MEMORY_BYTES // 64)
 
 # ==================== MODELS ====================
 
@@ -248,6 +1549,15 @@ class TranslateRequest(BaseModel):
     target_lang: str = "TR"
     tone: str = "corporate"
 
+class TranslateBatchRequest(BaseModel):
+    segments: List[str] = []
+    catalog_id: Optional[str] = None
+    page_ids: Optional[List[str]] = None
+    fields: Optional[List[str]] = None
+    source_lang: str = "EN"
+    target_lang: str = "TR"
+    tone: str = "corporate"
+
 class ExportRequest(BaseModel):
     html_content: str
     format: str = "pdf"
@@ -258,12 +1568,22 @@ class ExportRequest(BaseModel):
     landscape: bool = False
     optimize: bool = False
     debug_html: bool = False
+    priority: int = 0
 
 class BatchExportRequest(BaseModel):
     html_content: str
     presets: List[dict] = []
     catalog_name: str = "export"
     debug_html: bool = False
+    priority: int = 0
+
+class CatalogPdfRequest(BaseModel):
+    pages_html: Dict[str, str] = {}
+    width: int = 210
+    height: int = 297
+    landscape: bool = False
+    debug_html: bool = False
+    priority: int = 0
 
 class ExportRecord(BaseModel):
     model_config = ConfigDict(extra="allow")
@@ -294,13 +1614,51 @@ DEFAULT_GLOSSARY = [
 ]
 
 # ==================== STARTUP ====================
+async def run_blob_migration():
+    try:
+        await migrate_inline_images()
+    except Exception as e:
+        logger.warning(f"Blob migration failed: {e}")
+
+async def run_search_backfill():
+    try:
+        await backfill_search_keys()
+    except Exception as e:
+        logger.warning(f"Search key backfill failed: {e}")
+
+async def prewarm_render_pool():
+    try:
+        await _render_scheduler.prewarm(RENDER_POOL_PREWARM)
+        logger.info(f"Render page pool prewarmed: {RENDER_POOL_PREWARM} page(s)")
+    except Exception as e:
+        logger.warning(f"Render page pool prewarm skipped: {e}")
+
 @app.on_event("startup")
 async def startup():
+    global _export_job_sweeper
     try:
         cp = resolve_chromium_path()
         logger.info(f"Chromium path resolved at startup: {cp}")
     except Exception as e:
         logger.warning(f"Chromium path resolve warning: {e}")
+    for cache in (_export_cache, _bg_mask_cache, _bg_result_cache):
+        try:
+            cache.load_index()
+        except Exception as e:
+            logger.warning(f"Cache index load failed ({cache.directory}): {e}")
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        logger.warning(f"Index bootstrap failed: {e}")
+    if RENDER_POOL_PREWARM > 0:
+        asyncio.create_task(prewarm_render_pool())
+    _loop_monitor.start()
+    if REMBG_PRELOAD:
+        asyncio.create_task(preload_rembg())
+    await resume_export_jobs()
+    if EXPORT_JOB_RETENTION_HOURS > 0 and _export_job_sweeper is None:
+        _export_job_sweeper = asyncio.create_task(sweep_export_jobs())
+    asyncio.create_task(run_blob_migration())
 
     # Seed default themes
     for theme in DEFAULT_THEMES:
@@ -312,6 +1670,7 @@ async def startup():
         existing = await db.glossary.find_one({"id": term["id"]}, {"_id": 0})
         if not existing:
             await db.glossary.insert_one(term)
+            await bump_glossary_version()
     # Seed demo projects (only if no catalogs exist)
     cat_count = await db.catalogs.count_documents({})
     if cat_count == 0:
@@ -360,6 +1719,7 @@ async def startup():
             "created_at": datetime.now(timezone.utc).isoformat(), "updated_at": datetime.now(timezone.utc).isoformat()
         })
         logger.info("Seed projects created: VPI catalog + greeting + condolence cards")
+    asyncio.create_task(run_search_backfill())
     logger.info("Startup complete")
 
 # ==================== CATALOG CRUD ====================
@@ -367,18 +1727,56 @@ async def startup():
 async def root():
     return {"message": "Pro Creative Studio API", "version": "1.0"}
 
+LIST_PAGE_SIZE = int(os.environ.get('LIST_PAGE_SIZE', '50'))
+LIST_PAGE_SIZE_MAX = 200
+
+def encode_cursor(doc: dict) -> str:
+    raw = json.dumps([doc.get('updated_at', ''), doc.get('id', '')]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def apply_cursor(query: dict, cursor: Optional[str]) -> dict:
+    """Restrict `query` to documents after `cursor` in (updated_at desc, id desc) order."""
+    if not cursor:
+        return query
+    try:
+        updated_at, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise HTTPException(400, "Gecersiz cursor")
+    after = {"$or": [{"updated_at": {"$lt": updated_at}}, {"updated_at": updated_at, "id": {"$lt": last_id}}]}
+    return {"$and": [query, after]} if query else after
+
+def blob_ref_or_none(expr: str) -> dict:
+    """Aggregation expression: `expr` if it is a blob ref, else null (never ship inline images in listings)."""
+    return {"$cond": [{"$eq": [{"$substrCP": [{"$ifNull": [expr, ""]}, 0, len(BLOB_REF_PREFIX)]}, BLOB_REF_PREFIX]}, expr, None]}
+
+async def list_page(coll, query: dict, projection: dict, response: Response, limit: Optional[int], cursor: Optional[str]) -> List[dict]:
+    limit = max(1, min(limit or LIST_PAGE_SIZE, LIST_PAGE_SIZE_MAX))
+    pipeline = [
+        {"$match": apply_cursor(query, cursor)},
+        {"$sort": {"updated_at": -1, "id": -1}},
+        {"$limit": limit + 1},
+        {"$project": {"_id": 0, **projection}},
+    ]
+    items = await coll.aggregate(pipeline).to_list(limit + 1)
+    if len(items) > limit:
+        items = items[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(items[-1])
+    return items
+
+CATALOG_SUMMARY = {
+    "id": 1, "name": 1, "product_name": 1, "tags": 1, "template_id": 1, "theme_id": 1, "version": 1,
+    "created_at": 1, "updated_at": 1,
+    "page_count": {"$size": {"$ifNull": ["$pages", []]}},
+    "thumbnail": blob_ref_or_none({"$arrayElemAt": ["$pages.content.image_data", 0]}),
+}
+
 @api_router.get("/catalogs")
-async def get_catalogs(search: Optional[str] = None, tag: Optional[str] = None):
-    query = {}
-    if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"product_name": {"$regex": search, "$options": "i"}}
-        ]
+async def get_catalogs(response: Response, search: Optional[str] = None, tag: Optional[str] = None,
+                       limit: Optional[int] = None, cursor: Optional[str] = None):
+    query = search_filter(search) if search else {}
     if tag:
         query["tags"] = tag
-    catalogs = await db.catalogs.find(query, {"_id": 0}).sort("updated_at", -1).to_list(1000)
-    return catalogs
+    return await list_page(db.catalogs, query, CATALOG_SUMMARY, response, limit, cursor)
 
 @api_router.post("/catalogs")
 async def create_catalog(data: CatalogCreate):
@@ -388,6 +1786,7 @@ async def create_catalog(data: CatalogCreate):
         pages=[Page(order=0, content=PageContent(template_id=data.template_id))]
     )
     doc = catalog.model_dump()
+    doc["search_keys"] = search_keys(doc, SEARCH_FIELDS["catalogs"])
     await db.catalogs.insert_one(doc)
     doc.pop('_id', None)
     return doc
@@ -400,13 +1799,20 @@ async def get_catalog(catalog_id: str):
     return cat
 
 @api_router.put("/catalogs/{catalog_id}")
-async def update_catalog(catalog_id: str, update: CatalogUpdate):
+async def update_catalog(catalog_id: str, update: CatalogUpdate, response: Response):
     update_data = {k: v for k, v in update.model_dump().items() if v is not None}
+    if "name" in update_data or "product_name" in update_data:
+        current = await db.catalogs.find_one({"id": catalog_id}, {"_id": 0, "name": 1, "product_name": 1}) or {}
+        update_data["search_keys"] = search_keys({**current, **update_data}, SEARCH_FIELDS["catalogs"])
     update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
-    result = await db.catalogs.update_one({"id": catalog_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    updated = await db.catalogs.find_one_and_update(
+        {"id": catalog_id}, {"$set": update_data, "$inc": {"version": 1}},
+        projection={"_id": 0}, return_document=ReturnDocument.AFTER
+    )
+    if not updated:
         raise HTTPException(404, "Katalog bulunamadi")
-    return await db.catalogs.find_one({"id": catalog_id}, {"_id": 0})
+    set_version_header(response, updated.get("version"))
+    return updated
 
 @api_router.delete("/catalogs/{catalog_id}")
 async def delete_catalog(catalog_id: str):
@@ -430,80 +1836,184 @@ async def duplicate_catalog(catalog_id: str):
         "created_at": datetime.now(timezone.utc).isoformat(),
         "updated_at": datetime.now(timezone.utc).isoformat()
     }
+    new_cat["search_keys"] = search_keys(new_cat, SEARCH_FIELDS["catalogs"])
     await db.catalogs.insert_one(new_cat)
     new_cat.pop('_id', None)
     return new_cat
 
 # ==================== PAGE CRUD ====================
+# Page edits run as single filtered updates on the catalog and only ship the
+# touched page back. Every edit bumps `version`; clients may send it back in
+# If-Match to reject writes made against a stale copy.
+
+def expected_version(if_match: Optional[str]) -> Optional[int]:
+    if not if_match or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(400, "Gecersiz If-Match")
+
+def set_version_header(response: Response, version: Optional[int]):
+    if version is not None:
+        response.headers["ETag"] = f'"{version}"'
+
+async def page_write_failed(catalog_id: str, page_id: Optional[str] = None):
+    """Explain why a filtered page update matched nothing."""
+    projection = {"_id": 0, "version": 1}
+    if page_id:
+        projection["pages"] = {"$elemMatch": {"id": page_id}}
+    cat = await db.catalogs.find_one({"id": catalog_id}, projection)
+    if not cat:
+        raise HTTPException(404, "Katalog bulunamadi")
+    if page_id and not cat.get("pages"):
+        raise HTTPException(404, "Sayfa bulunamadi")
+    raise HTTPException(409, "Katalog baska bir oturumda degistirildi", headers={"ETag": f'"{cat.get("version")}"'})
+
 @api_router.post("/catalogs/{catalog_id}/pages")
-async def add_page(catalog_id: str):
-    cat = await db.catalogs.find_one({"id": catalog_id}, {"_id": 0})
+async def add_page(catalog_id: str, response: Response):
+    cat = await db.catalogs.find_one({"id": catalog_id}, {"_id": 0, "template_id": 1, "pages.order": 1})
     if not cat:
         raise HTTPException(404, "Katalog bulunamadi")
     max_order = max([p.get('order', 0) for p in cat.get('pages', [])] or [0])
     template_id = cat.get('template_id', 'industrial-product-alert')
     new_page = Page(order=max_order + 1, content=PageContent(template_id=template_id))
     doc = new_page.model_dump()
-    await db.catalogs.update_one(
+    updated = await db.catalogs.find_one_and_update(
         {"id": catalog_id},
-        {"$push": {"pages": doc}, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$push": {"pages": doc}, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}, "$inc": {"version": 1}},
+        projection={"_id": 0, "version": 1}, return_document=ReturnDocument.AFTER
     )
+    if not updated:
+        raise HTTPException(404, "Katalog bulunamadi")
+    set_version_header(response, updated.get("version"))
     return doc
 
 @api_router.put("/catalogs/{catalog_id}/pages/{page_id}")
-async def update_page(catalog_id: str, page_id: str, content: dict = Body(...)):
-    cat = await db.catalogs.find_one({"id": catalog_id}, {"_id": 0})
-    if not cat:
-        raise HTTPException(404, "Katalog bulunamadi")
-    page_index = next((i for i, p in enumerate(cat.get('pages', [])) if p.get('id') == page_id), None)
-    if page_index is None:
-        raise HTTPException(404, "Sayfa bulunamadi")
+async def update_page(catalog_id: str, page_id: str, response: Response, content: dict = Body(...),
+                      if_match: Optional[str] = Header(None)):
     now = datetime.now(timezone.utc).isoformat()
-    await db.catalogs.update_one(
-        {"id": catalog_id},
-        {"$set": {f"pages.{page_index}.content": content.get('content', content), f"pages.{page_index}.updated_at": now, "updated_at": now}}
+    page_content = await externalize_images(content.get('content', content))
+    query = {"id": catalog_id, "pages.id": page_id}
+    version = expected_version(if_match)
+    if version is not None:
+        query["version"] = version
+    updated = await db.catalogs.find_one_and_update(
+        query,
+        {"$set": {"pages.$[p].content": page_content, "pages.$[p].updated_at": now, "updated_at": now}, "$inc": {"version": 1}},
+        array_filters=[{"p.id": page_id}],
+        projection={"_id": 0, "version": 1, "pages": {"$elemMatch": {"id": page_id}}},
+        return_document=ReturnDocument.AFTER
     )
-    updated = await db.catalogs.find_one({"id": catalog_id}, {"_id": 0})
-    return updated['pages'][page_index]
+    if not updated:
+        await page_write_failed(catalog_id, page_id)
+    set_version_header(response, updated.get("version"))
+    return updated['pages'][0]
+
+PATCH_PATH_RE = re.compile(r'^[A-Za-z0-9_-]+(\.[A-Za-z0-9_-]+)*$')
+
+class PagePatch(BaseModel):
+    set: Dict[str, Any] = {}
+    unset: List[str] = []
+
+def page_patch_paths(patch: PagePatch) -> List[str]:
+    """Validate content paths: plain dotted segments only, no path may contain another."""
+    paths = sorted([*patch.set, *patch.unset])
+    for path in paths:
+        if not PATCH_PATH_RE.match(path):
+            raise HTTPException(400, f"Gecersiz alan yolu: {path}")
+    for a, b in zip(paths, paths[1:]):
+        if a == b:
+            raise HTTPException(400, f"Cakisan alan yollari: {a}, {b}")
+    # Sorted neighbours are not enough ("a-b" sorts between "a" and "a.c"),
+    # so every dotted prefix is looked up in the full set.
+    known = set(paths)
+    for path in paths:
+        parts = path.split(".")
+        for i in range(1, len(parts)):
+            prefix = ".".join(parts[:i])
+            if prefix in known:
+                raise HTTPException(400, f"Cakisan alan yollari: {prefix}, {path}")
+    return paths
+
+@api_router.patch("/catalogs/{catalog_id}/pages/{page_id}")
+async def patch_page(catalog_id: str, page_id: str, patch: PagePatch, response: Response,
+                     if_match: Optional[str] = Header(None)):
+    """Autosave: apply only the changed content paths as targeted $set/$unset."""
+    page_patch_paths(patch)
+    now = datetime.now(timezone.utc).isoformat()
+    update = {"$set": {"pages.$[p].updated_at": now, "updated_at": now}, "$inc": {"version": 1}}
+    for path, value in patch.set.items():
+        update["$set"][f"pages.$[p].content.{path}"] = await externalize_images(value)
+    if patch.unset:
+        update["$unset"] = {f"pages.$[p].content.{path}": "" for path in patch.unset}
+    query = {"id": catalog_id, "pages.id": page_id}
+    version = expected_version(if_match)
+    if version is not None:
+        query["version"] = version
+    updated = await db.catalogs.find_one_and_update(
+        query, update, array_filters=[{"p.id": page_id}],
+        projection={"_id": 0, "version": 1}, return_document=ReturnDocument.AFTER
+    )
+    if not updated:
+        await page_write_failed(catalog_id, page_id)
+    set_version_header(response, updated.get("version"))
+    return {"version": updated.get("version"), "updated_at": now}
 
 @api_router.delete("/catalogs/{catalog_id}/pages/{page_id}")
-async def delete_page(catalog_id: str, page_id: str):
-    cat = await db.catalogs.find_one({"id": catalog_id}, {"_id": 0})
-    if not cat:
-        raise HTTPException(404, "Katalog bulunamadi")
-    if len(cat.get('pages', [])) <= 1:
-        raise HTTPException(400, "En az bir sayfa olmali")
-    await db.catalogs.update_one(
-        {"id": catalog_id},
-        {"$pull": {"pages": {"id": page_id}}, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}}
+async def delete_page(catalog_id: str, page_id: str, response: Response, if_match: Optional[str] = Header(None)):
+    query = {"id": catalog_id, "pages.id": page_id, "pages.1": {"$exists": True}}
+    version = expected_version(if_match)
+    if version is not None:
+        query["version"] = version
+    updated = await db.catalogs.find_one_and_update(
+        query,
+        {"$pull": {"pages": {"id": page_id}}, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}, "$inc": {"version": 1}},
+        projection={"_id": 0, "version": 1}, return_document=ReturnDocument.AFTER
     )
+    if not updated:
+        cat = await db.catalogs.find_one({"id": catalog_id, "pages.id": page_id}, {"_id": 0, "pages.id": 1})
+        if cat and len(cat.get('pages', [])) <= 1:
+            raise HTTPException(400, "En az bir sayfa olmali")
+        await page_write_failed(catalog_id, page_id)
+    set_version_header(response, updated.get("version"))
     return {"message": "Sayfa silindi"}
 
 @api_router.post("/catalogs/{catalog_id}/pages/{page_id}/duplicate")
-async def duplicate_page(catalog_id: str, page_id: str):
-    cat = await db.catalogs.find_one({"id": catalog_id}, {"_id": 0})
-    if not cat:
-        raise HTTPException(404, "Katalog bulunamadi")
-    original = next((p for p in cat.get('pages', []) if p.get('id') == page_id), None)
-    if not original:
-        raise HTTPException(404, "Sayfa bulunamadi")
-    max_order = max([p.get('order', 0) for p in cat.get('pages', [])])
-    new_page = {**original, "id": str(uuid.uuid4()), "order": max_order + 1, "created_at": datetime.now(timezone.utc).isoformat()}
-    await db.catalogs.update_one(
-        {"id": catalog_id},
-        {"$push": {"pages": new_page}, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}}
+async def duplicate_page(catalog_id: str, page_id: str, response: Response):
+    # The copy is built server-side by an update pipeline, so the page content never leaves the database.
+    new_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc).isoformat()
+    original = {"$first": {"$filter": {"input": "$pages", "cond": {"$eq": ["$$this.id", page_id]}}}}
+    copy = {"$mergeObjects": [original, {
+        "id": new_id, "order": {"$add": [{"$max": "$pages.order"}, 1]}, "created_at": now, "updated_at": now
+    }]}
+    updated = await db.catalogs.find_one_and_update(
+        {"id": catalog_id, "pages.id": page_id},
+        [{"$set": {"pages": {"$concatArrays": ["$pages", [copy]]}, "updated_at": now, "version": {"$add": [{"$ifNull": ["$version", 1]}, 1]}}}],
+        projection={"_id": 0, "version": 1, "pages": {"$elemMatch": {"id": new_id}}},
+        return_document=ReturnDocument.AFTER
     )
-    return new_page
+    if not updated:
+        await page_write_failed(catalog_id, page_id)
+    set_version_header(response, updated.get("version"))
+    return updated['pages'][0]
 
 # ==================== CARD CRUD ====================
+CARD_SUMMARY = {
+    "id": 1, "name": 1, "card_type": 1, "created_at": 1, "updated_at": 1,
+    "template_id": "$content.template_id",
+    "background_color": "$content.background_color",
+    "thumbnail": blob_ref_or_none("$content.image_data"),
+}
+
 @api_router.get("/cards")
-async def get_cards(card_type: Optional[str] = None, search: Optional[str] = None):
-    query = {}
+async def get_cards(response: Response, card_type: Optional[str] = None, search: Optional[str] = None,
+                    limit: Optional[int] = None, cursor: Optional[str] = None):
+    query = search_filter(search) if search else {}
     if card_type:
         query["card_type"] = card_type
-    if search:
-        query["name"] = {"$regex": search, "$options": "i"}
-    return await db.cards.find(query, {"_id": 0}).sort("updated_at", -1).to_list(1000)
+    return await list_page(db.cards, query, CARD_SUMMARY, response, limit, cursor)
 
 @api_router.post("/cards")
 async def create_card(data: dict = Body(...)):
@@ -512,6 +2022,7 @@ async def create_card(data: dict = Body(...)):
         card.content.background_color = "#1e293b"
         card.content.template_id = "condolence-classic"
     doc = card.model_dump()
+    doc["search_keys"] = search_keys(doc, SEARCH_FIELDS["cards"])
     await db.cards.insert_one(doc)
     doc.pop('_id', None)
     return doc
@@ -525,6 +2036,10 @@ async def get_card(card_id: str):
 
 @api_router.put("/cards/{card_id}")
 async def update_card(card_id: str, data: dict = Body(...)):
+    data = await externalize_images(data)
+    data.pop("search_keys", None)
+    if "name" in data:
+        data["search_keys"] = search_keys(data, SEARCH_FIELDS["cards"])
     data["updated_at"] = datetime.now(timezone.utc).isoformat()
     result = await db.cards.update_one({"id": card_id}, {"$set": data})
     if result.matched_count == 0:
@@ -541,11 +2056,9 @@ async def delete_card(card_id: str):
 # ==================== ASSET CRUD ====================
 @api_router.get("/assets")
 async def get_assets(category: Optional[str] = None, search: Optional[str] = None):
-    query = {}
+    query = search_filter(search) if search else {}
     if category and category != "all":
         query["category"] = category
-    if search:
-        query["name"] = {"$regex": search, "$options": "i"}
     assets = await db.assets.find(query, {"_id": 0, "data": 0}).sort("created_at", -1).to_list(1000)
     return assets
 
@@ -558,21 +2071,21 @@ async def get_asset(asset_id: str):
 
 @api_router.post("/assets")
 async def upload_asset(file: UploadFile = File(...), name: str = Form(""), category: str = Form("other"), tags: str = Form("")):
-    contents = await file.read()
-    b64 = base64.b64encode(contents).decode('utf-8')
+    contents = await read_upload(file)
     ext = file.filename.rsplit('.', 1)[-1].lower() if file.filename else 'png'
     mime = f"image/{ext}" if ext != 'svg' else "image/svg+xml"
-    data_uri = f"data:{mime};base64,{b64}"
+    ingested = await ingest_image(contents, mime)
     asset = Asset(
         name=name or file.filename or "asset",
         category=category, file_type=ext,
-        data=data_uri, size_bytes=len(contents),
+        data=ingested["image_data"], size_bytes=len(contents),
         tags=[t.strip() for t in tags.split(',') if t.strip()]
     )
     doc = asset.model_dump()
+    doc["search_keys"] = search_keys(doc, SEARCH_FIELDS["assets"])
     await db.assets.insert_one(doc)
     doc.pop('_id', None)
-    return {k: v for k, v in doc.items() if k != 'data'}
+    return {**{k: v for k, v in doc.items() if k != 'data'}, "duplicate": ingested["duplicate"], "similar": ingested["similar"]}
 
 @api_router.delete("/assets/{asset_id}")
 async def delete_asset(asset_id: str):
@@ -613,6 +2126,124 @@ async def delete_theme(theme_id: str):
     return {"message": "Tema silindi"}
 
 # ==================== GLOSSARY CRUD ====================
+# Every glossary write bumps a persistent version; translation cache keys and the
+# in-process copy of the locked terms are tied to it.
+GLOSSARY_PLACEHOLDER_RE = re.compile(r'__GLOSS_(\d+)__')
+
+
+GLOSSARY_FOLD = str.maketrans({'İ': 'i', 'I': 'i', 'ı': 'i'})
+
+
+def fold_case(text: str) -> str:
+    """Lowercase without changing length, so match offsets stay valid on the original text.
+
+    The Turkish dotted/dotless i pairs all fold to `i` so İZMİR, izmir and IZMIR match alike.
+    """
+    text = text.translate(GLOSSARY_FOLD)
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: reports every (start, end, value) occurrence in one pass over the text."""
+
+    def __init__(self, patterns: Dict[str, int]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.out: List[List[tuple]] = [[]]
+        for pattern, value in patterns.items():
+            state = 0
+            for ch in pattern:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = self.goto[state][ch] = len(self.goto)
+                    self.goto.append({})
+                    self.out.append([])
+                state = nxt
+            self.out[state].append((len(pattern), value))
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def finditer(self, text: str):
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            for length, value in self.out[state]:
+                yield i + 1 - length, i + 1, value
+
+
+class GlossaryMatcher:
+    """Locked glossary terms compiled once per glossary version.
+
+    `protect` swaps every term for a __GLOSS_n__ placeholder in one pass,
+    taking the leftmost-longest match where terms overlap; `restore` puts the
+    target terms back in one pass.
+    """
+
+    def __init__(self, terms: List[dict]):
+        self.targets: List[str] = []
+        exact: Dict[str, int] = {}
+        folded: Dict[str, int] = {}
+        for term in terms:
+            src = term.get('source_term') or ''
+            if not src:
+                continue
+            table, key = (exact, src) if term.get('case_sensitive', True) else (folded, fold_case(src))
+            if key not in table:
+                table[key] = len(self.targets)
+                self.targets.append(term.get('target_term', ''))
+        self._exact = AhoCorasick(exact) if exact else None
+        self._folded = AhoCorasick(folded) if folded else None
+
+    def protect(self, text: str):
+        matches = []
+        if self._exact:
+            matches.extend(self._exact.finditer(text))
+        if self._folded:
+            matches.extend(self._folded.finditer(fold_case(text)))
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+        parts, used, pos = [], set(), 0
+        for start, end, idx in matches:
+            if start < pos:
+                continue
+            parts.append(text[pos:start])
+            parts.append(f"__GLOSS_{idx}__")
+            used.add(idx)
+            pos = end
+        parts.append(text[pos:])
+        return ''.join(parts), used
+
+    def restore(self, text: str, used: set) -> str:
+        return GLOSSARY_PLACEHOLDER_RE.sub(
+            lambda m: self.targets[int(m.group(1))] if int(m.group(1)) in used else m.group(0), text)
+
+
+_glossary_cache: Dict[str, Any] = {"version": None, "matcher": GlossaryMatcher([])}
+
+async def glossary_version() -> int:
+    doc = await db.meta.find_one({"id": "glossary"}, {"_id": 0, "version": 1})
+    return doc.get("version", 0) if doc else 0
+
+async def bump_glossary_version():
+    await db.meta.update_one({"id": "glossary"}, {"$inc": {"version": 1}}, upsert=True)
+
+async def glossary_matcher(version: int) -> GlossaryMatcher:
+    if _glossary_cache["version"] != version:
+        terms = await db.glossary.find({"locked": True}, {"_id": 0, "source_term": 1, "target_term": 1, "case_sensitive": 1}).to_list(None)
+        _glossary_cache.update(version=version, matcher=GlossaryMatcher(terms))
+    return _glossary_cache["matcher"]
+
 @api_router.get("/glossary")
 async def get_glossary():
     return await db.glossary.find({}, {"_id": 0}).to_list(500)
@@ -622,6 +2253,7 @@ async def add_glossary_term(data: dict = Body(...)):
     term = GlossaryTerm(**data)
     doc = term.model_dump()
     await db.glossary.insert_one(doc)
+    await bump_glossary_version()
     doc.pop('_id', None)
     return doc
 
@@ -631,6 +2263,7 @@ async def update_glossary_term(term_id: str, data: dict = Body(...)):
     result = await db.glossary.update_one({"id": term_id}, {"$set": data})
     if result.matched_count == 0:
         raise HTTPException(404, "Terim bulunamadi")
+    await bump_glossary_version()
     return await db.glossary.find_one({"id": term_id}, {"_id": 0})
 
 @api_router.delete("/glossary/{term_id}")
@@ -638,46 +2271,169 @@ async def delete_glossary_term(term_id: str):
     result = await db.glossary.delete_one({"id": term_id})
     if result.deleted_count == 0:
         raise HTTPException(404, "Terim bulunamadi")
+    await bump_glossary_version()
     return {"message": "Terim silindi"}
 
+# ==================== BLOBS ====================
+@api_router.get("/blobs/{blob_hash}")
+async def get_blob(blob_hash: str, w: Optional[int] = None, if_none_match: Optional[str] = Header(None)):
+    """Serve a blob; `?w=N` serves the smallest derivative at least N px wide."""
+    if not BLOB_HASH_RE.match(blob_hash):
+        raise HTTPException(404, "Dosya bulunamadi")
+    if w:
+        try:
+            blob_hash = await pick_derivative(blob_hash, w)
+        except (OSError, ValueError):
+            raise HTTPException(404, "Dosya bulunamadi")
+    etag = f'"{blob_hash}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if if_none_match and etag in if_none_match:
+        return Response(status_code=304, headers=headers)
+    path = blob_path(blob_hash)
+    if not path.is_file():
+        raise HTTPException(404, "Dosya bulunamadi")
+    async with aiofiles.open(path, 'rb') as f:
+        head = await f.read(1024)
+    return FileResponse(path, media_type=sniff_image_mime(head), headers=headers)
+
+@api_router.post("/blobs/gc")
+async def blob_gc(dry_run: bool = True):
+    """Recount blob references; with dry_run=false also delete unreferenced blobs."""
+    return await collect_blob_garbage(dry_run)
+
+# ==================== UPLOAD LIMITS ====================
+# Starlette spools multipart files to a temp file, so handlers decode from that
+# file object instead of reading uploads into memory. Oversized bodies are
+# rejected from Content-Length before parsing; every other body (JSON) is read
+# into memory by FastAPI, so it gets its own smaller cap. Image dimensions are
+# checked from the header before any pixel is decoded.
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_MB', '50')) * 1024 * 1024
+BACKUP_MAX_BYTES = int(os.environ.get('BACKUP_MAX_MB', '1024')) * 1024 * 1024
+JSON_BODY_MAX_BYTES = int(os.environ.get('JSON_BODY_MAX_MB', '20')) * 1024 * 1024
+IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_MEGAPIXELS', '120')) * 1_000_000
+UPLOAD_MAX_DIMENSION = int(os.environ.get('UPLOAD_MAX_DIMENSION', '4000'))
+UPLOAD_JPEG_QUALITY = int(os.environ.get('UPLOAD_JPEG_QUALITY', '92'))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+EXIF_ORIENTATION = 0x0112
+
+# Pillow's own bomb guard (error at 2x this value) as a backstop for decodes outside open_image.
+Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+
+
+def upload_limit(path: str) -> int:
+    """Whole-body limit; each file is still checked against UPLOAD_MAX_BYTES by read_upload."""
+    if path.endswith("/backup/import"):
+        return BACKUP_MAX_BYTES
+    if path.endswith("/remove-bg/batch"):
+        return REMBG_BATCH_MAX * UPLOAD_MAX_BYTES
+    return UPLOAD_MAX_BYTES
+
+@app.middleware("http")
+async def limit_upload_size(request, call_next):
+    length = request.headers.get("content-length")
+    if length and length.isdigit():
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            if int(length) > upload_limit(request.url.path):
+                return JSONResponse({"detail": "Dosya cok buyuk"}, status_code=413)
+        elif int(length) > JSON_BODY_MAX_BYTES:
+            return JSONResponse({"detail": "Istek govdesi cok buyuk"}, status_code=413)
+    return await call_next(request)
+
+def check_upload_size(file: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES):
+    """Chunked requests carry no Content-Length, so re-check the spooled file."""
+    size = file.size
+    if size is None:
+        file.file.seek(0, os.SEEK_END)
+        size = file.file.tell()
+        file.file.seek(0)
+    if size > max_bytes:
+        raise HTTPException(413, "Dosya cok buyuk")
+
+async def read_upload(file: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES) -> bytes:
+    check_upload_size(file, max_bytes)
+    buf = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        buf += chunk
+        if len(buf) > max_bytes:
+            raise HTTPException(413, "Dosya cok buyuk")
+    return bytes(buf)
+
+def open_image(source) -> Image.Image:
+    """Open an image from bytes or a file object; only the header is read."""
+    try:
+        img = Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+    except Image.DecompressionBombError:
+        raise HTTPException(422, "Gorsel cozunurlugu cok yuksek")
+    except UnidentifiedImageError:
+        raise HTTPException(400, "Gecersiz gorsel dosyasi")
+    if img.width * img.height > IMAGE_MAX_PIXELS:
+        raise HTTPException(422, "Gorsel cozunurlugu cok yuksek")
+    return img
+
+def oriented_size(img: Image.Image):
+    w, h = img.size
+    return (h, w) if img.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8) else (w, h)
+
+def load_scaled(img: Image.Image, width: int, height: int) -> Image.Image:
+    """Decode at no less than width x height (display orientation) and apply EXIF rotation.
+
+    JPEGs are DCT-scaled by draft() while decoding, so a 40 MP photo headed
+    for 4000 px is never fully materialised; other formats decode normally.
+    """
+    if oriented_size(img) != img.size:
+        width, height = height, width
+    img.draft(None, (width, height))
+    return ImageOps.exif_transpose(img)
+
+def fit_within(size, max_dim: int):
+    w, h = size
+    scale = min(1.0, max_dim / max(w, h))
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
 # ==================== IMAGE UPLOAD ====================
-@api_router.post("/upload-image")
-async def upload_image(file: UploadFile = File(...)):
-    contents = await file.read()
-    img = Image.open(io.BytesIO(contents))
-    img = ImageOps.exif_transpose(img)
+def encode_upload(source):
+    img = open_image(source)
     original_format = img.format or 'JPEG'
-    
+    target = fit_within(oriented_size(img), UPLOAD_MAX_DIMENSION)
+
+    # Upright JPEGs that already fit are stored as uploaded, without re-encoding
+    if original_format == 'JPEG' and target == img.size and img.getexif().get(EXIF_ORIENTATION, 1) == 1:
+        source.seek(0)
+        return source.read(), 'image/jpeg', img.width, img.height
+
+    img = load_scaled(img, *target)
+    if img.size != target:
+        img.thumbnail(target, Image.LANCZOS, reducing_gap=3.0)
+
     # Preserve PNG with transparency
     if img.mode == 'RGBA' or original_format == 'PNG':
         output = io.BytesIO()
         img.save(output, format='PNG', optimize=True)
-        output.seek(0)
-        b64 = base64.b64encode(output.read()).decode('utf-8')
-        return {"image_data": f"data:image/png;base64,{b64}", "width": img.width, "height": img.height}
+        return output.getvalue(), 'image/png', img.width, img.height
     
-    # JPEG - high quality, no unnecessary re-encoding for small files
-    if img.mode == 'P':
-        img = img.convert('RGB')
-    elif img.mode != 'RGB':
+    if img.mode != 'RGB':
         img = img.convert('RGB')
     
     output = io.BytesIO()
-    img.save(output, format='JPEG', quality=97, optimize=True)
-    output.seek(0)
-    b64 = base64.b64encode(output.read()).decode('utf-8')
-    return {"image_data": f"data:image/jpeg;base64,{b64}", "width": img.width, "height": img.height}
+    img.save(output, format='JPEG', quality=UPLOAD_JPEG_QUALITY, optimize=True)
+    return output.getvalue(), 'image/jpeg', img.width, img.height
+
+@api_router.post("/upload-image")
+async def upload_image(file: UploadFile = File(...)):
+    check_upload_size(file)
+    data, mime, width, height = await _image_pool.run(encode_upload, file.file)
+    return {**await ingest_image(data, mime), "width": width, "height": height}
 
 # ==================== RESIZE IMAGE ====================
-@api_router.post("/resize-image")
-async def resize_image(file: UploadFile = File(...), width: int = Form(1200), height: int = Form(0), quality: int = Form(90), sharpen: bool = Form(False), output_format: str = Form("jpeg")):
-    contents = await file.read()
-    img = Image.open(io.BytesIO(contents))
-    img = ImageOps.exif_transpose(img)
+def resize_encode(source, width: int, height: int, quality: int, sharpen: bool, output_format: str):
+    img = open_image(source)
     if height == 0:
-        ratio = width / img.width
-        height = int(img.height * ratio)
-    img = img.resize((width, height), Image.LANCZOS)
+        src_w, src_h = oriented_size(img)
+        height = max(1, int(src_h * width / src_w))
+    if width * height > IMAGE_MAX_PIXELS:
+        raise HTTPException(422, "Gorsel cozunurlugu cok yuksek")
+    img = load_scaled(img, width, height)
+    img = img.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
     if sharpen:
         img = img.filter(ImageFilter.SHARPEN)
     output = io.BytesIO()
@@ -691,57 +2447,171 @@ async def resize_image(file: UploadFile = File(...), width: int = Form(1200), he
             bg = Image.new('RGB', img.size, (255, 255, 255))
             bg.paste(img, mask=img.split()[3])
             img = bg
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
         img.save(output, format='JPEG', quality=quality, optimize=True)
         mime = "image/jpeg"
-    output.seek(0)
-    b64 = base64.b64encode(output.read()).decode('utf-8')
-    return {"image_data": f"data:{mime};base64,{b64}", "width": width, "height": height, "size": output.tell()}
+    return output.getvalue(), mime, width, height
+
+@api_router.post("/resize-image")
+async def resize_image(file: UploadFile = File(...), width: int = Form(1200), height: int = Form(0), quality: int = Form(90), sharpen: bool = Form(False), output_format: str = Form("jpeg")):
+    check_upload_size(file)
+    if width <= 0 or height < 0:
+        raise HTTPException(400, "Gecersiz boyut")
+    data, mime, width, height = await _image_pool.run(resize_encode, file.file, width, height, quality, sharpen, output_format)
+    return {**await ingest_image(data, mime), "width": width, "height": height, "size": len(data)}
 
 # ==================== BACKGROUND REMOVAL ====================
-@api_router.post("/remove-bg")
-async def remove_background(file: UploadFile = File(...), feather: int = Form(0), shadow: bool = Form(False), shadow_opacity: int = Form(40)):
-    contents = await file.read()
+def compose_bg_result(contents: bytes, mask_png: bytes, feather: int, shadow: bool, shadow_opacity: int):
+    """Cut the image out with a cached rembg mask, then apply feather and drop shadow."""
+    img = ImageOps.exif_transpose(open_image(contents)).convert('RGBA')
+    mask = Image.open(io.BytesIO(mask_png)).convert('L')
+    result = Image.composite(img, Image.new('RGBA', img.size, (0, 0, 0, 0)), mask)
+    if feather > 0:
+        alpha = result.split()[3]
+        alpha = alpha.filter(ImageFilter.GaussianBlur(radius=feather))
+        result.putalpha(alpha)
+    if shadow:
+        shadow_img = result.copy()
+        shadow_alpha = shadow_img.split()[3]
+        s_opacity = int(255 * shadow_opacity / 100)
+        shadow_alpha = shadow_alpha.point(lambda p: min(p, s_opacity))
+        shadow_color = Image.new('RGBA', result.size, (0, 0, 0, 255))
+        shadow_color.putalpha(shadow_alpha)
+        shadow_color = shadow_color.filter(ImageFilter.GaussianBlur(radius=8))
+        offset = (5, 5)
+        canvas = Image.new('RGBA', (result.width + 10, result.height + 10), (0, 0, 0, 0))
+        canvas.paste(shadow_color, offset)
+        canvas.paste(result, (0, 0), result)
+        result = canvas
+    output = io.BytesIO()
+    result.save(output, format='PNG', optimize=True)
+    return output.getvalue(), result.width, result.height
+
+def rembg_model(model: Optional[str]) -> str:
+    model = model or REMBG_MODEL
+    if model not in REMBG_MODELS:
+        raise HTTPException(400, f"Desteklenmeyen model: {model}")
+    return model
+
+async def remove_background_bytes(contents: bytes, feather: int, shadow: bool, shadow_opacity: int, model: str) -> dict:
+    open_image(contents)  # reject undecodable files and bombs before they reach a rembg worker
     file_hash = hashlib.md5(contents).hexdigest()
-    cache_key = f"{file_hash}_{feather}_{shadow}_{shadow_opacity}"
-    if cache_key in _bg_cache:
-        return {"image_data": _bg_cache[cache_key], "cached": True}
+    cache_key = f"{file_hash}_{feather}_{shadow}_{shadow_opacity}_{model}"
+
+    async def compute_mask() -> bytes:
+        return await _rembg_pool.run(image_worker.remove_bg_mask, contents, model)
+
+    async def compute_result() -> bytes:
+        mask_png, _ = await _bg_mask_cache.get_or_render(f"{file_hash}_{model}", 'png', compute_mask)
+        png, width, height = await _image_pool.run(compose_bg_result, contents, mask_png, feather, shadow, shadow_opacity)
+        image_ref = blob_ref(await put_blob(png, 'image/png', derive=True))
+        return json.dumps({"image_data": image_ref, "width": width, "height": height}).encode('utf-8')
+
+    data, cached = await _bg_result_cache.get_or_render(cache_key, 'json', compute_result)
+    result = json.loads(data)
+    ref = BLOB_REF_RE.fullmatch(result.get("image_data", ""))
+    if cached and ref and not (blob_path(ref.group(1)).is_file() and await touch_blobs([ref.group(1)])):
+        _bg_result_cache.discard(cache_key)
+        data, cached = await _bg_result_cache.get_or_render(cache_key, 'json', compute_result)
+        result = json.loads(data)
+    return {**result, "cached": cached}
+
+@api_router.post("/remove-bg")
+async def remove_background(file: UploadFile = File(...), feather: int = Form(0), shadow: bool = Form(False), shadow_opacity: int = Form(40),
+                            model: Optional[str] = Form(None)):
+    model = rembg_model(model)
+    contents = await read_upload(file)
     try:
-        from rembg import remove
-        img = Image.open(io.BytesIO(contents))
-        img = ImageOps.exif_transpose(img)
-        result = remove(img)
-        if feather > 0:
-            alpha = result.split()[3]
-            alpha = alpha.filter(ImageFilter.GaussianBlur(radius=feather))
-            result.putalpha(alpha)
-        if shadow:
-            shadow_layer = Image.new('RGBA', result.size, (0, 0, 0, 0))
-            shadow_img = result.copy()
-            shadow_alpha = shadow_img.split()[3]
-            s_opacity = int(255 * shadow_opacity / 100)
-            shadow_alpha = shadow_alpha.point(lambda p: min(p, s_opacity))
-            shadow_color = Image.new('RGBA', result.size, (0, 0, 0, 255))
-            shadow_color.putalpha(shadow_alpha)
-            shadow_color = shadow_color.filter(ImageFilter.GaussianBlur(radius=8))
-            from PIL import ImageChops
-            offset = (5, 5)
-            canvas = Image.new('RGBA', (result.width + 10, result.height + 10), (0, 0, 0, 0))
-            canvas.paste(shadow_color, offset)
-            canvas.paste(result, (0, 0), result)
-            result = canvas
-        output = io.BytesIO()
-        result.save(output, format='PNG', optimize=True)
-        output.seek(0)
-        b64 = base64.b64encode(output.read()).decode('utf-8')
-        data_uri = f"data:image/png;base64,{b64}"
-        _bg_cache[cache_key] = data_uri
-        return {"image_data": data_uri, "cached": False, "width": result.width, "height": result.height}
+        return await remove_background_bytes(contents, feather, shadow, shadow_opacity, model)
+    except HTTPException:
+        raise
     except ImportError:
         raise HTTPException(503, "rembg kurulu degil. pip install rembg ile kurun.")
     except Exception as e:
         logger.error(f"BG removal error: {e}")
         raise HTTPException(500, f"Arka plan kaldirma hatasi: {str(e)}")
 
+@api_router.post("/remove-bg/batch")
+async def remove_background_batch(files: List[UploadFile] = File(...), feather: int = Form(0), shadow: bool = Form(False),
+                                  shadow_opacity: int = Form(40), model: Optional[str] = Form(None)):
+    """Remove backgrounds from a whole product image set.
+
+    Uploads stay spooled on disk and are read a chunk at a time (one image per
+    pool worker), so only one chunk's bytes are held in memory. Masks that are
+    not cached yet are inferred in one call per rembg worker; compositing then
+    runs per image.
+    """
+    model = rembg_model(model)
+    if len(files) > REMBG_BATCH_MAX:
+        raise HTTPException(400, f"En fazla {REMBG_BATCH_MAX} gorsel gonderilebilir")
+    for f in files:
+        check_upload_size(f)
+    chunk_size = max(_rembg_pool.workers, _image_pool.workers)
+
+    async def infer_masks(items: List[tuple]) -> Dict[str, str]:
+        errors: Dict[str, str] = {}
+        missing: Dict[str, bytes] = {}
+        for _, key, contents in items:
+            if key not in missing and await _bg_mask_cache.get(key) is None:
+                missing[key] = contents
+        if not missing:
+            return errors
+        keys = list(missing)
+        chunks = [keys[i::_rembg_pool.workers] for i in range(min(_rembg_pool.workers, len(keys)))]
+        try:
+            outputs = await asyncio.gather(*[
+                _rembg_pool.run(image_worker.remove_bg_masks, [missing[k] for k in chunk], model) for chunk in chunks
+            ])
+        except ImportError:
+            raise HTTPException(503, "rembg kurulu degil. pip install rembg ile kurun.")
+        for chunk, output in zip(chunks, outputs):
+            for key, (mask_png, error) in zip(chunk, output):
+                if error:
+                    errors[key] = error
+                else:
+                    await _bg_mask_cache.put(key, 'png', mask_png)
+        return errors
+
+    semaphore = asyncio.Semaphore(_image_pool.workers)
+
+    async def process(name: str, key: str, contents: bytes, errors: Dict[str, str]) -> dict:
+        if key in errors:
+            return {"file_name": name, "error": errors[key]}
+        async with semaphore:
+            try:
+                return {"file_name": name, **await remove_background_bytes(contents, feather, shadow, shadow_opacity, model)}
+            except Exception as e:
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                return {"file_name": name, "error": detail}
+
+    results = []
+    for start in range(0, len(files), chunk_size):
+        items = []
+        for i, f in enumerate(files[start:start + chunk_size], start):
+            contents = await read_upload(f)
+            items.append((f.filename or f"image_{i}", f"{hashlib.md5(contents).hexdigest()}_{model}", contents))
+        errors = await infer_masks(items)
+        results.extend(await asyncio.gather(*[process(name, key, contents, errors) for name, key, contents in items]))
+    return {"model": model, "results": results}
+
+async def preload_rembg():
+    """Start every rembg worker so the model is loaded before the first request."""
+    try:
+        await asyncio.gather(*[
+            _rembg_pool.run(image_worker.warm_up, REMBG_MODEL, bounded=False) for _ in range(_rembg_pool.workers)
+        ])
+        logger.info(f"rembg model preloaded: {REMBG_MODEL} ({_rembg_pool.workers} process(es), {REMBG_THREADS} thread(s) each)")
+    except Exception as e:
+        logger.warning(f"rembg preload skipped: {e}")
+
+@api_router.get("/remove-bg/metrics")
+async def remove_background_metrics():
+    return {
+        "model": REMBG_MODEL, "models": REMBG_MODELS, "threads_per_process": REMBG_THREADS,
+        "masks": _bg_mask_cache.stats(), "results": _bg_result_cache.stats(), "pool": _rembg_pool.stats(),
+    }
+
 # ==================== TRANSLATION ====================
 TONES = {
     "corporate": "Resmi, profesyonel kurumsal dil kullan. Kisa ve net cumleler tercih et.",
@@ -750,56 +2620,551 @@ TONES = {
     "short": "Cok kisa ve ozetleyici cevir. Baslik tarzi, minimum kelime."
 }
 
-@api_router.post("/translate")
-async def translate_text(req: TranslateRequest):
-    if req.source_lang == req.target_lang:
-        return {"translated_text": req.text}
-    glossary = await db.glossary.find({"locked": True}, {"_id": 0}).to_list(500)
-    placeholders = {}
-    text = req.text
-    for i, term in enumerate(glossary):
-        src = term['source_term']
-        ph = f"__GLOSS_{i}__"
-        if term.get('case_sensitive', True):
-            if src in text:
-                placeholders[ph] = term['target_term']
-                text = text.replace(src, ph)
-        else:
-            import re
-            pattern = re.compile(re.escape(src), re.IGNORECASE)
-            if pattern.search(text):
-                placeholders[ph] = term['target_term']
-                text = pattern.sub(ph, text)
-    lang_names = {'EN': 'English', 'TR': 'Turkce', 'RU': 'Rusca', 'ES': 'Ispanyolca', 'AZ': 'Azerbaycanca'}
-    src_name = lang_names.get(req.source_lang.upper(), req.source_lang)
-    tgt_name = lang_names.get(req.target_lang.upper(), req.target_lang)
-    tone_instruction = TONES.get(req.tone, TONES['corporate'])
-    system_prompt = f"Sen profesyonel bir cevirmensin. {src_name} dilinden {tgt_name} diline ceviri yap. {tone_instruction} Sadece ceviriyi dondur, baska bir sey ekleme. __GLOSS_X__ formatindaki yer tutucularini AYNEN koru, cevirme."
-    emergent_key = os.environ.get('EMERGENT_LLM_KEY')
-    if not emergent_key or not EMERGENT_AVAILABLE:
+# ----- Translation memory -----
+# Results are stored in db.translations keyed by (normalized text, language pair,
+# tone, glossary version). Entries expire TRANSLATION_CACHE_TTL_DAYS after their
+# last hit (TTL index); above TRANSLATION_CACHE_MAX_ENTRIES the least recently
+# hit entries are trimmed.
+TRANSLATION_CACHE = os.environ.get('TRANSLATION_CACHE', '1') == '1'
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.environ.get('TRANSLATION_CACHE_MAX_ENTRIES', '200000'))
+TRANSLATION_TRIM_EVERY = 500
+_translation_stats = {"hits": 0, "misses": 0, "stores": 0, "trimmed": 0, "errors": 0}
+
+
+def normalize_translation_text(text: str) -> str:
+    """NFC, unified line endings, collapsed runs of spaces; line breaks are kept."""
+    text = unicodedata.normalize('NFC', text).replace('\r\n', '\n').replace('\r', '\n')
+    return '\n'.join(' '.join(line.split()) for line in text.strip().split('\n'))
+
+
+def translation_key(text: str, source_lang: str, target_lang: str, tone: str, glossary_ver: int) -> str:
+    raw = json.dumps([text, source_lang, target_lang, tone, glossary_ver], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+async def cached_translation(key: str) -> Optional[str]:
+    if not TRANSLATION_CACHE:
+        return None
+    doc = await db.translations.find_one_and_update(
+        {"key": key}, {"$set": {"last_hit_at": datetime.now(timezone.utc)}, "$inc": {"hits": 1}},
+        projection={"_id": 0, "translated_text": 1},
+    )
+    _translation_stats["hits" if doc else "misses"] += 1
+    return doc["translated_text"] if doc else None
+
+
+async def store_translation(key: str, text: str, source_lang: str, target_lang: str, tone: str, glossary_ver: int, translated: str):
+    if not TRANSLATION_CACHE:
+        return
+    now = datetime.now(timezone.utc)
+    await db.translations.update_one(
+        {"key": key},
+        {"$set": {"translated_text": translated, "last_hit_at": now},
+         "$setOnInsert": {"key": key, "text": text, "source_lang": source_lang, "target_lang": target_lang,
+                          "tone": tone, "glossary_version": glossary_ver, "hits": 0, "created_at": now.isoformat()}},
+        upsert=True,
+    )
+    _translation_stats["stores"] += 1
+    if TRANSLATION_CACHE_MAX_ENTRIES and _translation_stats["stores"] % TRANSLATION_TRIM_EVERY == 0:
+        await trim_translation_cache()
+
+
+async def trim_translation_cache():
+    excess = await db.translations.estimated_document_count() - TRANSLATION_CACHE_MAX_ENTRIES
+    if excess <= 0:
+        return
+    oldest = await db.translations.find({}, {"_id": 1}).sort("last_hit_at", ASCENDING).limit(excess).to_list(excess)
+    result = await db.translations.delete_many({"_id": {"$in": [d["_id"] for d in oldest]}})
+    _translation_stats["trimmed"] += result.deleted_count
+
+
+LANG_NAMES = {'EN': 'English', 'TR': 'Turkce', 'RU': 'Rusca', 'ES': 'Ispanyolca', 'AZ': 'Azerbaycanca'}
+
+def translation_prompt(source_lang: str, target_lang: str, tone: str, extra: str = "") -> str:
+    src_name = LANG_NAMES.get(source_lang, source_lang)
+    tgt_name = LANG_NAMES.get(target_lang, target_lang)
+    return (f"Sen profesyonel bir cevirmensin. {src_name} dilinden {tgt_name} diline ceviri yap. {TONES[tone]} "
+            f"Sadece ceviriyi dondur, baska bir sey ekleme. __GLOSS_X__ formatindaki yer tutucularini AYNEN koru, cevirme.{extra}")
+
+# ----- Providers -----
+# TRANSLATION_PROVIDER selects the model backend:
+#   emergent - emergentintegrations LlmChat (EMERGENT_LLM_KEY), the default
+#   openai   - any OpenAI-compatible chat completions API, including local servers
+#              (TRANSLATION_API_URL / TRANSLATION_API_KEY / TRANSLATION_MODEL)
+#   mock     - deterministic offline stub for load tests and benchmarks
+TRANSLATION_PROVIDER = os.environ.get('TRANSLATION_PROVIDER', 'emergent').lower()
+TRANSLATION_MODEL = os.environ.get('TRANSLATION_MODEL', 'gpt-4o-mini')
+TRANSLATION_TIMEOUT_S = float(os.environ.get('TRANSLATION_TIMEOUT_S', '60'))
+
+
+class TranslationProvider(ABC):
+    name = "none"
+
+    def configured(self) -> bool:
+        return True
+
+    @abstractmethod
+    async def complete(self, system_prompt: str, text: str) -> str:
+        ...
+
+    async def close(self):
+        pass
+
+
+class EmergentTranslationProvider(TranslationProvider):
+    """LlmChat keeps the conversation on the instance, so each request gets its own chat."""
+    name = "emergent"
+
+    def __init__(self, api_key: Optional[str], model: str):
+        self.api_key = api_key
+        self.model = model
+
+    def configured(self) -> bool:
+        return bool(self.api_key) and EMERGENT_AVAILABLE
+
+    async def complete(self, system_prompt: str, text: str) -> str:
+        chat = LlmChat(api_key=self.api_key, session_id=str(uuid.uuid4()), system_message=system_prompt).with_model("openai", self.model)
+        return await chat.send_message(UserMessage(text=f"Cevir:\n{text}"))
+
+
+class OpenAICompatibleTranslationProvider(TranslationProvider):
+    """Stateless chat completions over one long-lived HTTP client (kept-alive connections)."""
+    name = "openai"
+
+    def __init__(self, base_url: str, api_key: Optional[str], model: str, timeout: float, max_connections: int):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url, headers=headers, timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    async def complete(self, system_prompt: str, text: str) -> str:
+        r = await self.client().post("/chat/completions", json={
+            "model": self.model, "temperature": 0,
+            "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": f"Cevir:\n{text}"}],
+        })
+        r.raise_for_status()
+        return r.json()["choices"][0]["message"]["content"]
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class MockTranslationProvider(TranslationProvider):
+    """Offline stub: waits `latency_ms` (+ `per_char_us` per input character) and tags every text line.
+
+    Segment markers, placeholders and blank lines come back untouched, so glossary
+    protection, caching and batching run exactly as with a real model.
+    """
+    name = "mock"
+
+    def __init__(self, latency_ms: float, per_char_us: float):
+        self.latency_ms = latency_ms
+        self.per_char_us = per_char_us
+
+    async def complete(self, system_prompt: str, text: str) -> str:
+        await asyncio.sleep(self.latency_ms / 1000 + len(text) * self.per_char_us / 1_000_000)
+        return "\n".join(line if not line.strip() or SEGMENT_MARKER_RE.fullmatch(line) else f"[mock] {line}"
+                         for line in text.split("\n"))
+
+
+def make_translation_provider(name: str) -> TranslationProvider:
+    if name == "mock":
+        return MockTranslationProvider(float(os.environ.get('TRANSLATION_MOCK_LATENCY_MS', '200')),
+                                       float(os.environ.get('TRANSLATION_MOCK_PER_CHAR_US', '0')))
+    if name == "openai":
+        return OpenAICompatibleTranslationProvider(
+            os.environ.get('TRANSLATION_API_URL', 'https://api.openai.com/v1'), os.environ.get('TRANSLATION_API_KEY'),
+            TRANSLATION_MODEL, TRANSLATION_TIMEOUT_S, int(os.environ.get('TRANSLATION_CONCURRENCY', '4')))
+    if name != "emergent":
+        logger.warning(f"Unknown TRANSLATION_PROVIDER {name!r}, using emergent")
+    return EmergentTranslationProvider(os.environ.get('EMERGENT_LLM_KEY'), TRANSLATION_MODEL)
+
+
+_translation_provider = make_translation_provider(TRANSLATION_PROVIDER)
+
+
+async def call_translation_model(system_prompt: str, text: str) -> str:
+    if not _translation_provider.configured():
         raise HTTPException(503, "Ceviri servisi yapilandirilmamis. EMERGENT_LLM_KEY gerekli.")
     try:
-        chat = LlmChat(api_key=emergent_key, session_id=str(uuid.uuid4()), system_message=system_prompt).with_model("openai", "gpt-4o-mini")
-        response = await chat.send_message(UserMessage(text=f"Cevir:\n{text}"))
-        translated = response
-        for ph, replacement in placeholders.items():
-            translated = translated.replace(ph, replacement)
-        return {"translated_text": translated}
+        return await _translation_provider.complete(system_prompt, text)
     except Exception as e:
+        _translation_stats["errors"] += 1
         logger.error(f"Translation error: {e}")
         raise HTTPException(500, f"Ceviri hatasi: {str(e)}")
 
+@api_router.post("/translate")
+async def translate_text(req: TranslateRequest):
+    if req.source_lang == req.target_lang:
+        return {"translated_text": req.text}
+    source_lang, target_lang = req.source_lang.upper(), req.target_lang.upper()
+    tone = req.tone if req.tone in TONES else 'corporate'
+    version = await glossary_version()
+    normalized = normalize_translation_text(req.text)
+    key = translation_key(normalized, source_lang, target_lang, tone, version)
+    cached = await cached_translation(key)
+    if cached is not None:
+        return {"translated_text": cached, "cached": True}
+    matcher = await glossary_matcher(version)
+    text, used_terms = matcher.protect(normalized)
+    response = await call_translation_model(translation_prompt(source_lang, target_lang, tone), text)
+    translated = matcher.restore(response, used_terms)
+    await store_translation(key, normalized, source_lang, target_lang, tone, version, translated)
+    return {"translated_text": translated, "cached": False}
+
+# ----- Batch translation -----
+# Unique segments not in the translation memory are packed into as few model
+# calls as possible, each segment preceded by a <<<n>>> marker line. Calls run
+# concurrently, bounded by TRANSLATION_CONCURRENCY and spaced to stay under
+# TRANSLATION_RATE_PER_MIN. A chunk whose reply does not come back with exactly
+# the sent markers is retried one segment per call.
+TRANSLATION_CONCURRENCY = int(os.environ.get('TRANSLATION_CONCURRENCY', '4'))
+TRANSLATION_RATE_PER_MIN = int(os.environ.get('TRANSLATION_RATE_PER_MIN', '60'))
+TRANSLATION_CHUNK_CHARS = int(os.environ.get('TRANSLATION_CHUNK_CHARS', '6000'))
+TRANSLATION_CHUNK_SEGMENTS = 40
+TRANSLATION_BATCH_MAX = 2000
+TRANSLATABLE_FIELDS = ("title", "subtitle", "description", "body", "message", "cta", "cta_text", "applications",
+                       "key_benefits", "benefits", "bullet_points", "features", "label_alert", "label_applications",
+                       "label_benefits", "label_features")
+SEGMENT_MARKER_RE = re.compile(r'^<<<(\d+)>>>[ \t]*$', re.M)
+BATCH_PROMPT = (" Metin <<<n>>> satirlariyla ayrilmis parcalardan olusur. Her parcayi ayri cevir;"
+                " <<<n>>> satirlarini aynen ve ayni sirada koru, parcalari birlestirme.")
+
+
+class RateLimiter:
+    """Spaces call starts so that at most `per_minute` begin in any minute."""
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_translation_limiter = RateLimiter(TRANSLATION_RATE_PER_MIN)
+_translation_slots = asyncio.Semaphore(TRANSLATION_CONCURRENCY)
+
+
+def pack_segments(texts: List[str]) -> List[List[int]]:
+    chunks, current, size = [], [], 0
+    for i, text in enumerate(texts):
+        if current and (size + len(text) > TRANSLATION_CHUNK_CHARS or len(current) >= TRANSLATION_CHUNK_SEGMENTS):
+            chunks.append(current)
+            current, size = [], 0
+        current.append(i)
+        size += len(text)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def unpack_segments(reply: str, count: int) -> Optional[List[str]]:
+    parts = SEGMENT_MARKER_RE.split(reply)
+    if [int(n) for n in parts[1::2]] != list(range(1, count + 1)):
+        return None
+    return [p.strip() for p in parts[2::2]]
+
+
+async def limited_model_call(system_prompt: str, text: str) -> str:
+    async with _translation_slots:
+        await _translation_limiter.wait()
+        return await call_translation_model(system_prompt, text)
+
+
+async def translate_chunk(texts: List[str], source_lang: str, target_lang: str, tone: str) -> List[str]:
+    if len(texts) > 1:
+        body = "\n".join(f"<<<{n}>>>\n{t}" for n, t in enumerate(texts, 1))
+        reply = await limited_model_call(translation_prompt(source_lang, target_lang, tone, BATCH_PROMPT), body)
+        parsed = unpack_segments(reply, len(texts))
+        if parsed is not None:
+            return parsed
+        logger.warning(f"Batch translation reply lost segment markers, retrying {len(texts)} segment(s) one by one")
+    prompt = translation_prompt(source_lang, target_lang, tone)
+    return list(await asyncio.gather(*(limited_model_call(prompt, t) for t in texts)))
+
+
+async def translate_segments(segments: List[str], source_lang: str, target_lang: str, tone: str):
+    """Translate many texts; returns ({normalized: translation}, stats)."""
+    version = await glossary_version()
+    unique = list(dict.fromkeys(normalize_translation_text(t) for t in segments if t and t.strip()))
+    keys = {t: translation_key(t, source_lang, target_lang, tone, version) for t in unique}
+    results: Dict[str, str] = {}
+    if TRANSLATION_CACHE and unique:
+        now = datetime.now(timezone.utc)
+        found = await db.translations.find({"key": {"$in": list(keys.values())}}, {"_id": 0, "key": 1, "translated_text": 1}).to_list(None)
+        by_key = {d["key"]: d["translated_text"] for d in found}
+        if by_key:
+            await db.translations.update_many({"key": {"$in": list(by_key)}}, {"$set": {"last_hit_at": now}, "$inc": {"hits": 1}})
+        results = {t: by_key[k] for t, k in keys.items() if k in by_key}
+        _translation_stats["hits"] += len(results)
+        _translation_stats["misses"] += len(unique) - len(results)
+    missing = [t for t in unique if t not in results]
+    matcher = await glossary_matcher(version)
+    protected = [matcher.protect(t) for t in missing]
+    chunks = pack_segments([p[0] for p in protected])
+    replies = await asyncio.gather(*(translate_chunk([protected[i][0] for i in chunk], source_lang, target_lang, tone) for chunk in chunks))
+    for chunk, translated in zip(chunks, replies):
+        for i, reply in zip(chunk, translated):
+            results[missing[i]] = matcher.restore(reply, protected[i][1])
+            await store_translation(keys[missing[i]], missing[i], source_lang, target_lang, tone, version, results[missing[i]])
+    stats = {"segments": len(segments), "unique": len(unique), "cached": len(unique) - len(missing), "model_calls": len(chunks)}
+    return results, stats
+
+
+def translatable_values(content: dict, fields) -> Dict[str, Any]:
+    """Text fields of a page (strings or lists of strings) to be translated."""
+    values = {}
+    for field in fields:
+        value = content.get(field)
+        if isinstance(value, str) and value.strip():
+            values[field] = value
+        elif isinstance(value, list) and value and all(isinstance(v, str) for v in value):
+            values[field] = value
+    return values
+
+
+@api_router.post("/translate/batch")
+async def translate_batch(req: TranslateBatchRequest, response: Response, if_match: Optional[str] = Header(None)):
+    """Translate a list of segments, or the text fields of a catalog's pages and save them in one update."""
+    source_lang, target_lang = req.source_lang.upper(), req.target_lang.upper()
+    tone = req.tone if req.tone in TONES else 'corporate'
+    if not req.catalog_id:
+        if len(req.segments) > TRANSLATION_BATCH_MAX:
+            raise HTTPException(400, f"En fazla {TRANSLATION_BATCH_MAX} parca gonderilebilir")
+        if source_lang == target_lang:
+            return {"translations": req.segments, "stats": {"segments": len(req.segments), "unique": 0, "cached": 0, "model_calls": 0}}
+        results, stats = await translate_segments(req.segments, source_lang, target_lang, tone)
+        return {"translations": [results.get(normalize_translation_text(t), t) for t in req.segments], "stats": stats}
+
+    fields = [f for f in (req.fields or TRANSLATABLE_FIELDS) if PATCH_PATH_RE.match(f) and '.' not in f]
+    cat = await db.catalogs.find_one({"id": req.catalog_id}, {"_id": 0, "version": 1, "pages.id": 1, **{f"pages.content.{f}": 1 for f in fields}})
+    if not cat:
+        raise HTTPException(404, "Katalog bulunamadi")
+    version = expected_version(if_match)
+    if version is not None and version != cat.get("version"):
+        raise HTTPException(409, "Katalog baska bir oturumda degistirildi", headers={"ETag": f'"{cat.get("version")}"'})
+    pages = [p for p in cat.get("pages", []) if req.page_ids is None or p.get("id") in req.page_ids]
+    originals = {p["id"]: translatable_values(p.get("content", {}), fields) for p in pages}
+    segments = [t for values in originals.values() for v in values.values() for t in (v if isinstance(v, list) else [v])]
+    if source_lang == target_lang or not segments:
+        return {"pages": {}, "skipped": [], "version": cat.get("version"), "stats": {"segments": len(segments), "unique": 0, "cached": 0, "model_calls": 0}}
+    results, stats = await translate_segments(segments, source_lang, target_lang, tone)
+
+    def translated(value):
+        if isinstance(value, list):
+            return [results.get(normalize_translation_text(v), v) if v.strip() else v for v in value]
+        return results.get(normalize_translation_text(value), value)
+
+    now = datetime.now(timezone.utc).isoformat()
+    updates, array_filters, written = {"updated_at": now}, [], {}
+    for page_id, values in originals.items():
+        for field, value in values.items():
+            # Each field is only replaced if it still holds the text that was translated,
+            # so edits made while the model was running are kept.
+            ident = f"f{len(array_filters)}"
+            updates[f"pages.$[{ident}].content.{field}"] = translated(value)
+            array_filters.append({f"{ident}.id": page_id, f"{ident}.content.{field}": value})
+            written.setdefault(page_id, {})[field] = updates[f"pages.$[{ident}].content.{field}"]
+    query = {"id": req.catalog_id}
+    if version is not None:
+        query["version"] = version
+    updated = await db.catalogs.find_one_and_update(
+        query, {"$set": updates, "$inc": {"version": 1}}, array_filters=array_filters,
+        projection={"_id": 0, "version": 1, "pages.id": 1, **{f"pages.content.{f}": 1 for f in fields}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not updated:
+        await page_write_failed(req.catalog_id)
+    set_version_header(response, updated.get("version"))
+    current = {p["id"]: p.get("content", {}) for p in updated.get("pages", [])}
+    applied, skipped = {}, []
+    for page_id, values in written.items():
+        for field, value in values.items():
+            if current.get(page_id, {}).get(field) == value:
+                applied.setdefault(page_id, {})[field] = value
+            else:
+                skipped.append({"page_id": page_id, "field": field})
+    return {"pages": applied, "skipped": skipped, "version": updated.get("version"), "stats": stats}
+
+@api_router.get("/translate/metrics")
+async def translation_metrics():
+    lookups = _translation_stats["hits"] + _translation_stats["misses"]
+    return {
+        **_translation_stats,
+        "hit_rate": round(_translation_stats["hits"] / lookups, 4) if lookups else None,
+        "entries": await db.translations.estimated_document_count(),
+        "glossary_version": await glossary_version(),
+        "enabled": TRANSLATION_CACHE,
+        "provider": _translation_provider.name,
+    }
+
 @api_router.get("/translation-languages")
 async def get_translation_languages():
     return {"languages": {"EN": "English", "TR": "Turkce", "RU": "Rusca", "ES": "Espanol", "AZ": "Azerbaycanca"}}
 
+# ==================== ZIP STREAMING ====================
+# Archives are produced incrementally: each entry is compressed (in a thread)
+# into a small in-memory sink and drained to the caller right away, so an
+# archive is never held in memory as a whole. The sink is not seekable, which
+# makes zipfile write sizes in data descriptors after each entry.
+ZIP_STORED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp', 'gif', 'avif', 'pdf', 'zip'}
+ZIP_JSON_CHUNK_BYTES = 256 * 1024
+
+
+class ZipChunkSink:
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._pos = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def zip_entry_info(name: str) -> zipfile.ZipInfo:
+    """Already-compressed formats are stored as-is; deflating them again costs CPU and saves nothing."""
+    info = zipfile.ZipInfo(name, date_time=time.localtime(time.time())[:6])
+    ext = name.rsplit('.', 1)[-1].lower()
+    info.compress_type = zipfile.ZIP_STORED if ext in ZIP_STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    info.external_attr = 0o600 << 16
+    return info
+
+
+def json_chunks(obj) -> Iterator[bytes]:
+    """Serialize JSON piece by piece, in chunks of roughly ZIP_JSON_CHUNK_BYTES."""
+    buf, size = [], 0
+    for piece in json.JSONEncoder(ensure_ascii=False, indent=2).iterencode(obj):
+        buf.append(piece)
+        size += len(piece)
+        if size >= ZIP_JSON_CHUNK_BYTES:
+            yield ''.join(buf).encode('utf-8')
+            buf, size = [], 0
+    if buf:
+        yield ''.join(buf).encode('utf-8')
+
+
+async def iterate_async(items):
+    for item in items:
+        yield item
+
+
+async def stream_zip(entries: AsyncIterator, tee_path: Optional[Path] = None) -> AsyncIterator[bytes]:
+    """Yield ZIP bytes for (name, data) entries as they arrive; data is bytes or a (sync or async) iterable of byte chunks.
+
+    With `tee_path` the same bytes are written to disk; the file appears there only once the archive is complete.
+    """
+    sink = ZipChunkSink()
+    zf = zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED)
+    tmp = tee_path.with_name(f"{tee_path.name}.{uuid.uuid4().hex}.tmp") if tee_path else None
+    tee = await aiofiles.open(tmp, 'wb') if tmp else None
+    try:
+        async for name, data in entries:
+            info = zip_entry_info(name)
+            if isinstance(data, (bytes, bytearray)):
+                await asyncio.to_thread(zf.writestr, info, data)
+            else:
+                pieces = data if hasattr(data, '__aiter__') else iterate_async(data)
+                with zf.open(info, 'w', force_zip64=True) as w:
+                    async for piece in pieces:
+                        await asyncio.to_thread(w.write, piece)
+                        chunk = sink.drain()
+                        if chunk:
+                            if tee:
+                                await tee.write(chunk)
+                            yield chunk
+            chunk = sink.drain()
+            if chunk:
+                if tee:
+                    await tee.write(chunk)
+                yield chunk
+        await asyncio.to_thread(zf.close)
+        chunk = sink.drain()
+        if tee:
+            await tee.write(chunk)
+            await tee.close()
+            tee = None
+            os.replace(tmp, tee_path)
+        yield chunk
+    finally:
+        if tee:
+            await tee.close()
+            tmp.unlink(missing_ok=True)
+
+
+async def primed_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Run a stream up to its first chunk so early failures still become a proper HTTP error."""
+    first = await chunks.__anext__()
+
+    async def stream():
+        try:
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+    return stream()
+
+
+# ==================== EXPORT RESULT CACHE ====================
+EXPORT_CACHE_DIR = EXPORTS_DIR / "cache"
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_MB', '512')) * 1024 * 1024
+EXPORT_CACHE_MAX_ENTRIES = int(os.environ.get('EXPORT_CACHE_MAX_ENTRIES', '2000'))
+
+
+def export_cache_key(req: ExportRequest, fmt: str) -> str:
+    h = hashlib.sha256()
+    params = [fmt, req.width, req.height, req.is_mm, req.landscape, req.quality, req.optimize]
+    h.update(json.dumps(params).encode('utf-8'))
+    h.update(b'\0')
+    h.update(req.html_content.encode('utf-8'))
+    return h.hexdigest()
+
+
+_export_cache = DiskCache(EXPORT_CACHE_DIR, EXPORT_CACHE_MAX_BYTES, EXPORT_CACHE_MAX_ENTRIES)
+
 # ==================== EXPORT ENDPOINTS ====================
 @api_router.post("/export/pdf")
 async def export_pdf(req: ExportRequest):
     try:
         w = req.width if req.is_mm else int(req.width * 0.264583)
         h = req.height if req.is_mm else int(req.height * 0.264583)
-        pdf_bytes = await render_html_to_pdf(req.html_content, w, h, req.landscape)
+        pdf_bytes, cached = await _export_cache.get_or_render(
+            export_cache_key(req, 'pdf'), 'pdf',
+            lambda: render_html_to_pdf(req.html_content, w, h, req.landscape, priority=req.priority))
         record = ExportRecord(format="pdf", size_preset=f"{req.width}x{req.height}", quality="high" if not req.optimize else "web", file_size=len(pdf_bytes))
         await db.export_history.insert_one(record.model_dump())
         file_name = f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
@@ -812,7 +3177,7 @@ async def export_pdf(req: ExportRequest):
                     await hf.write(req.html_content)
         except Exception:
             pass
-        return StreamingResponse(io.BytesIO(pdf_bytes), media_type="application/pdf", headers={"Content-Disposition": f"attachment; filename={file_name}"})
+        return StreamingResponse(io.BytesIO(pdf_bytes), media_type="application/pdf", headers={"Content-Disposition": f"attachment; filename={file_name}", "X-Export-Cache": "hit" if cached else "miss"})
     except HTTPException:
         raise
     except Exception as e:
@@ -825,21 +3190,15 @@ async def export_image(req: ExportRequest):
         fmt = 'jpeg' if req.format in ('jpg', 'jpeg') else 'png'
         w = req.width if not req.is_mm else int(req.width * 3.7795)
         h = req.height if not req.is_mm else int(req.height * 3.7795)
-        img_bytes = await render_html_to_image(req.html_content, w, h, req.quality, fmt)
-        if req.optimize and fmt == 'jpeg':
-            img = Image.open(io.BytesIO(img_bytes))
-            output = io.BytesIO()
-            img.save(output, format='JPEG', quality=75, optimize=True)
-            output.seek(0)
-            img_bytes = output.read()
-        elif req.optimize and fmt == 'png':
-            img = Image.open(io.BytesIO(img_bytes))
-            output = io.BytesIO()
-            img.save(output, format='PNG', optimize=True, compress_level=9)
-            output.seek(0)
-            img_bytes = output.read()
         mime = "image/jpeg" if fmt == 'jpeg' else "image/png"
         ext = "jpg" if fmt == 'jpeg' else "png"
+
+        async def render():
+            data = await render_html_to_image(req.html_content, w, h, req.quality, fmt, priority=req.priority)
+            if req.optimize:
+                data = await _image_pool.run(optimize_image_bytes, data, fmt, bounded=False)
+            return data
+        img_bytes, cached = await _export_cache.get_or_render(export_cache_key(req, fmt), ext, render)
         file_name = f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{ext}"
         try:
             async with aiofiles.open(EXPORTS_DIR / file_name, 'wb') as f:
@@ -852,59 +3211,408 @@ async def export_image(req: ExportRequest):
             pass
         record = ExportRecord(format=ext, size_preset=f"{w}x{h}", quality="web" if req.optimize else "high", file_size=len(img_bytes))
         await db.export_history.insert_one(record.model_dump())
-        return StreamingResponse(io.BytesIO(img_bytes), media_type=mime, headers={"Content-Disposition": f"attachment; filename={file_name}"})
+        return StreamingResponse(io.BytesIO(img_bytes), media_type=mime, headers={"Content-Disposition": f"attachment; filename={file_name}", "X-Export-Cache": "hit" if cached else "miss"})
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Image export error: {e}")
         raise HTTPException(500, f"Gorsel olusturma hatasi: {str(e)}")
 
+def optimize_image_bytes(data: bytes, img_fmt: str) -> bytes:
+    img = Image.open(io.BytesIO(data))
+    output = io.BytesIO()
+    if img_fmt == 'jpeg':
+        img.save(output, format='JPEG', quality=75, optimize=True)
+    else:
+        img.save(output, format='PNG', optimize=True, compress_level=9)
+    return output.getvalue()
+
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '4'))
+
+def batch_file_names(presets: List[dict], safe_name: str, date_str: str) -> List[str]:
+    """Deterministic ZIP entry names, one per preset, in request order."""
+    names, seen = [], set()
+    for i, preset in enumerate(presets):
+        fmt = preset.get('format', 'png')
+        label = preset.get('label', f"{preset.get('width', 1080)}x{preset.get('height', 1080)}")
+        ext = 'pdf' if fmt == 'pdf' else ('jpg' if fmt in ('jpg', 'jpeg') else 'png')
+        fname = f"{safe_name}_{date_str}_{label}.{ext}"
+        if fname in seen:
+            fname = f"{safe_name}_{date_str}_{label}_{i + 1}.{ext}"
+        seen.add(fname)
+        names.append(fname)
+    return names
+
+BATCH_RENDER_ONCE = os.environ.get('BATCH_RENDER_ONCE', '1') == '1'
+BATCH_SHARED_RASTER = os.environ.get('BATCH_SHARED_RASTER', '0') == '1'
+
+def batch_image_target(preset: dict) -> dict:
+    w = preset.get('width', 1080)
+    h = preset.get('height', 1080)
+    is_mm = preset.get('is_mm', False)
+    return {
+        'width': w if not is_mm else int(w * 3.7795),
+        'height': h if not is_mm else int(h * 3.7795),
+        'quality': preset.get('quality', 90),
+        'img_format': 'jpeg' if preset.get('format', 'png') in ('jpg', 'jpeg') else 'png',
+    }
+
+async def finish_batch_image(data: bytes, preset: dict) -> bytes:
+    if preset.get('optimize', False):
+        # Pillow work runs in a thread so it overlaps with the other presets' renders
+        data = await _image_pool.run(optimize_image_bytes, data, batch_image_target(preset)['img_format'], bounded=False)
+    return data
+
+async def render_batch_preset(html_content: str, preset: dict, priority: int = 0) -> bytes:
+    fmt = preset.get('format', 'png')
+    if fmt == 'pdf':
+        w = preset.get('width', 1080)
+        h = preset.get('height', 1080)
+        is_mm = preset.get('is_mm', False)
+        pw = w if is_mm else int(w * 0.264583)
+        ph = h if is_mm else int(h * 0.264583)
+        return await render_html_to_pdf(html_content, pw, ph, preset.get('landscape', False), priority=priority)
+    t = batch_image_target(preset)
+    data = await render_html_to_image(html_content, t['width'], t['height'], t['quality'], t['img_format'], priority=priority)
+    return await finish_batch_image(data, preset)
+
+async def render_batch_entries(req: BatchExportRequest, file_names: List[str]):
+    """Yield (preset_index, file_name, data) for every preset as renders complete."""
+    sem = asyncio.Semaphore(max(1, BATCH_CONCURRENCY))
+    # Image presets share one loaded document; image_slots maps preset index -> result position
+    image_presets = [(i, p) for i, p in enumerate(req.presets) if p.get('format', 'png') != 'pdf']
+    image_slots = {i: slot for slot, (i, _) in enumerate(image_presets)}
+    shared_images = None
+    if BATCH_RENDER_ONCE and len(image_presets) > 1:
+        async def render_images():
+            async with sem:
+                return await render_html_to_images(req.html_content, [batch_image_target(p) for _, p in image_presets],
+                                                   shared_raster=BATCH_SHARED_RASTER, priority=req.priority)
+        shared_images = asyncio.create_task(render_images())
+
+    async def run_preset(i: int, preset: dict):
+        if shared_images is not None and i in image_slots:
+            rendered = await asyncio.shield(shared_images)
+            return i, await finish_batch_image(rendered[image_slots[i]], preset)
+        async with sem:
+            return i, await render_batch_preset(req.html_content, preset, req.priority)
+
+    tasks = [asyncio.create_task(run_preset(i, preset)) for i, preset in enumerate(req.presets)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            i, data = await next_done
+            yield i, file_names[i], data
+    finally:
+        for t in tasks:
+            t.cancel()
+        if shared_images is not None:
+            shared_images.cancel()
+
 @api_router.post("/export/batch")
 async def export_batch(req: BatchExportRequest):
-    zip_buffer = io.BytesIO()
     date_str = datetime.now().strftime('%Y%m%d')
     safe_name = req.catalog_name.replace(' ', '_')[:30]
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-        for preset in req.presets:
-            fmt = preset.get('format', 'png')
-            w = preset.get('width', 1080)
-            h = preset.get('height', 1080)
-            is_mm = preset.get('is_mm', False)
-            label = preset.get('label', f'{w}x{h}')
-            optimize = preset.get('optimize', False)
-            quality = preset.get('quality', 90)
-            if fmt == 'pdf':
-                pw = w if is_mm else int(w * 0.264583)
-                ph = h if is_mm else int(h * 0.264583)
-                data = await render_html_to_pdf(req.html_content, pw, ph, preset.get('landscape', False))
-                fname = f"{safe_name}_{date_str}_{label}.pdf"
-            else:
-                iw = w if not is_mm else int(w * 3.7795)
-                ih = h if not is_mm else int(h * 3.7795)
-                img_fmt = 'jpeg' if fmt in ('jpg', 'jpeg') else 'png'
-                data = await render_html_to_image(req.html_content, iw, ih, quality, img_fmt)
-                if optimize:
-                    img = Image.open(io.BytesIO(data))
-                    output = io.BytesIO()
-                    if img_fmt == 'jpeg':
-                        img.save(output, format='JPEG', quality=75, optimize=True)
-                    else:
-                        img.save(output, format='PNG', optimize=True, compress_level=9)
-                    output.seek(0)
-                    data = output.read()
-                ext = 'jpg' if img_fmt == 'jpeg' else 'png'
-                fname = f"{safe_name}_{date_str}_{label}.{ext}"
-            zf.writestr(fname, data)
-    zip_buffer.seek(0)
+    file_names = batch_file_names(req.presets, safe_name, date_str)
     zip_name = f"{safe_name}_{date_str}_batch.zip"
-    async with aiofiles.open(EXPORTS_DIR / zip_name, 'wb') as f:
-        await f.write(zip_buffer.getvalue())
     if req.debug_html:
         debug_path = EXPORTS_DIR / f"export_debug_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
         async with aiofiles.open(debug_path, 'w', encoding='utf-8') as hf:
             await hf.write(req.html_content)
-    zip_buffer.seek(0)
-    return StreamingResponse(zip_buffer, media_type="application/zip", headers={"Content-Disposition": f"attachment; filename={zip_name}"})
+
+    async def entries():
+        # Entries are appended as renders finish; names stay tied to their preset
+        async for _, fname, data in render_batch_entries(req, file_names):
+            yield fname, data
+
+    # The ZIP goes to the client and to EXPORTS_DIR at the same time, entry by entry
+    body = await primed_stream(stream_zip(entries(), EXPORTS_DIR / zip_name))
+    return StreamingResponse(body, media_type="application/zip", headers={"Content-Disposition": f"attachment; filename={zip_name}"})
+
+@api_router.get("/export/metrics")
+async def get_export_metrics():
+    return {"scheduler": _render_scheduler.stats(), "render": render_metrics(), "cache": _export_cache.stats()}
+
+# ==================== CATALOG PDF ====================
+HEAD_RE = re.compile(r'<head[^>]*>(.*?)</head>', re.S | re.I)
+BODY_RE = re.compile(r'<body[^>]*>(.*)</body>', re.S | re.I)
+
+def compose_catalog_document(pages_html: List[str], width_mm: int, height_mm: int):
+    """Merge per-page template documents into one paginated document.
+
+    Identical <head> blocks (the shared template styles) are kept once and
+    repeated inline images become shared assets. Returns (html, assets).
+    """
+    heads, sheets = [], []
+    for html in pages_html:
+        head = HEAD_RE.search(html)
+        body = BODY_RE.search(html)
+        if head and head.group(1) not in heads:
+            heads.append(head.group(1))
+        sheets.append(f'<section class="catalog-sheet">{body.group(1) if body else html}</section>')
+    sheet_css = (
+        f"@page {{ size: {width_mm}mm {height_mm}mm; margin: 0; }} "
+        f".catalog-sheet {{ width: {width_mm}mm; height: {height_mm}mm; position: relative; overflow: hidden; break-after: page; }} "
+        ".catalog-sheet:last-child { break-after: auto; }"
+    )
+    doc = f"<!DOCTYPE html><html><head>{''.join(heads)}<style>{sheet_css}</style></head><body style=\"margin:0\">{''.join(sheets)}</body></html>"
+    return externalize_data_uris(doc)
+
+async def _next_chunk(chunks: asyncio.Queue, task: asyncio.Task) -> Optional[bytes]:
+    """Next streamed chunk, None when the render finished; re-raises render errors."""
+    if chunks.empty() and not task.done():
+        getter = asyncio.ensure_future(chunks.get())
+        await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+        if getter.done():
+            return getter.result()
+        getter.cancel()
+    if not chunks.empty():
+        return chunks.get_nowait()
+    task.result()
+    return None
+
+@api_router.post("/export/catalog/{catalog_id}/pdf")
+async def export_catalog_pdf(catalog_id: str, req: CatalogPdfRequest):
+    # Templates are generated by the client; the catalog only supplies page order
+    cat = await db.catalogs.find_one({"id": catalog_id}, {"_id": 0, "name": 1, "product_name": 1, "pages.id": 1, "pages.order": 1})
+    if not cat:
+        raise HTTPException(404, "Katalog bulunamadi")
+    pages = sorted(cat.get('pages', []), key=lambda p: p.get('order', 0))
+    missing = [p['id'] for p in pages if p['id'] not in req.pages_html]
+    if not pages or missing:
+        raise HTTPException(400, f"Sayfa HTML'i eksik: {', '.join(missing)}")
+    html, assets = await asyncio.to_thread(compose_catalog_document, [req.pages_html[p['id']] for p in pages], req.width, req.height)
+
+    chunks: asyncio.Queue = asyncio.Queue(maxsize=8)
+    task = asyncio.create_task(render_html_to_pdf_stream(html, chunks, req.width, req.height, req.landscape, assets, req.priority))
+    try:
+        first = await _next_chunk(chunks, task)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Catalog PDF export error: {e}")
+        raise HTTPException(500, f"PDF olusturma hatasi: {str(e)}")
+
+    safe_name = (cat.get('product_name') or cat.get('name') or 'catalog').replace(' ', '_')[:30]
+    file_name = f"{safe_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    if req.debug_html:
+        async with aiofiles.open(EXPORTS_DIR / f"export_debug_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html", 'w', encoding='utf-8') as hf:
+            await hf.write(html)
+
+    async def stream():
+        size = 0
+        chunk = first
+        try:
+            async with aiofiles.open(EXPORTS_DIR / file_name, 'wb') as f:
+                while chunk is not None:
+                    size += len(chunk)
+                    await f.write(chunk)
+                    yield chunk
+                    chunk = await _next_chunk(chunks, task)
+            record = ExportRecord(catalog_id=catalog_id, format="pdf", size_preset=f"{req.width}x{req.height}",
+                                  file_name=file_name, file_size=size, page_count=len(pages))
+            await db.export_history.insert_one(record.model_dump())
+        finally:
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/pdf", headers={"Content-Disposition": f"attachment; filename={file_name}"})
+
+# ==================== EXPORT JOBS ====================
+EXPORT_JOBS_DIR = EXPORTS_DIR / "jobs"
+EXPORT_JOB_CONCURRENCY = int(os.environ.get('EXPORT_JOB_CONCURRENCY', '2'))
+EXPORT_JOB_MAX_ATTEMPTS = 5
+EXPORT_JOB_RETENTION_HOURS = int(os.environ.get('EXPORT_JOB_RETENTION_HOURS', '24'))
+EXPORT_JOB_SWEEP_INTERVAL_S = 3600
+EXPORT_MEDIA_TYPES = {"pdf": "application/pdf", "png": "image/png", "jpg": "image/jpeg", "zip": "application/zip"}
+_export_job_sem = asyncio.Semaphore(max(1, EXPORT_JOB_CONCURRENCY))
+_export_job_tasks: set = set()
+_export_job_sweeper: Optional[asyncio.Task] = None
+
+class ExportJob(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    status: str = "queued"  # queued | rendering | zipping | done | failed
+    request: dict = {}
+    progress: List[dict] = []
+    completed: int = 0
+    total: int = 0
+    download_name: str = ""
+    html_hash: str = ""
+    result_file: str = ""
+    file_size: int = 0
+    error: str = ""
+    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+async def update_export_job(job_id: str, fields: dict):
+    fields["updated_at"] = datetime.now(timezone.utc).isoformat()
+    await db.export_jobs.update_one({"id": job_id}, {"$set": fields})
+
+def export_job_html_path(job_id: str) -> Path:
+    """The job's HTML lives next to its result, not in the job document (it can be many MB)."""
+    return EXPORT_JOBS_DIR / f"{job_id}.html"
+
+async def load_export_job_request(job: dict) -> BatchExportRequest:
+    request = job['request']
+    if 'html_content' not in request:  # jobs created before the HTML moved to disk keep it inline
+        async with aiofiles.open(export_job_html_path(job['id']), 'r', encoding='utf-8') as f:
+            request = {**request, "html_content": await f.read()}
+    return BatchExportRequest(**request)
+
+def schedule_export_job(job_id: str):
+    task = asyncio.create_task(run_export_job(job_id))
+    _export_job_tasks.add(task)
+    task.add_done_callback(_export_job_tasks.discard)
+
+async def write_export_job_result(job_id: str, req: BatchExportRequest, file_names: List[str]) -> Path:
+    EXPORT_JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    if len(file_names) == 1:
+        path = EXPORT_JOBS_DIR / f"{job_id}_{file_names[0]}"
+        async for i, _, data in render_batch_entries(req, file_names):
+            async with aiofiles.open(path, 'wb') as f:
+                await f.write(data)
+            await update_export_job(job_id, {f"progress.{i}.status": "done", "completed": 1})
+        return path
+    path = EXPORT_JOBS_DIR / f"{job_id}.zip"
+    zf = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+    try:
+        done = 0
+        async for i, fname, data in render_batch_entries(req, file_names):
+            await asyncio.to_thread(zf.writestr, zip_entry_info(fname), data)
+            done += 1
+            await update_export_job(job_id, {f"progress.{i}.status": "done", "completed": done})
+        await update_export_job(job_id, {"status": "zipping"})
+    finally:
+        await asyncio.to_thread(zf.close)
+    return path
+
+async def run_export_job(job_id: str):
+    async with _export_job_sem:
+        job = await db.export_jobs.find_one({"id": job_id}, {"_id": 0})
+        if not job or job.get('status') in ('done', 'failed'):
+            return
+        try:
+            req = await load_export_job_request(job)
+        except OSError:
+            await update_export_job(job_id, {"status": "failed", "error": "Export HTML'i bulunamadi"})
+            return
+        file_names = [p['file_name'] for p in job['progress']]
+        for attempt in range(1, EXPORT_JOB_MAX_ATTEMPTS + 1):
+            await update_export_job(job_id, {
+                "status": "rendering", "completed": 0,
+                "progress": [{**p, "status": "pending"} for p in job['progress']],
+            })
+            try:
+                path = await write_export_job_result(job_id, req, file_names)
+                break
+            except HTTPException as e:
+                if e.status_code == 429 and attempt < EXPORT_JOB_MAX_ATTEMPTS:
+                    await update_export_job(job_id, {"status": "queued"})
+                    await asyncio.sleep(int((e.headers or {}).get('Retry-After', '1')))
+                    continue
+                logger.error(f"Export job {job_id} failed: {e.detail}")
+                await update_export_job(job_id, {"status": "failed", "error": str(e.detail)})
+                export_job_html_path(job_id).unlink(missing_ok=True)
+                return
+            except Exception as e:
+                logger.error(f"Export job {job_id} failed: {e}")
+                await update_export_job(job_id, {"status": "failed", "error": str(e)})
+                export_job_html_path(job_id).unlink(missing_ok=True)
+                return
+        size = path.stat().st_size
+        await update_export_job(job_id, {"status": "done", "result_file": path.name, "file_size": size})
+        # The HTML is only needed to resume unfinished jobs
+        export_job_html_path(job_id).unlink(missing_ok=True)
+        await db.export_jobs.update_one({"id": job_id}, {"$unset": {"request.html_content": ""}})
+        if req.debug_html:
+            debug_path = EXPORTS_DIR / f"export_debug_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+            async with aiofiles.open(debug_path, 'w', encoding='utf-8') as hf:
+                await hf.write(req.html_content)
+        ext = path.suffix.lstrip('.')
+        first = req.presets[0]
+        size_preset = "batch" if ext == "zip" else f"{first.get('width', 1080)}x{first.get('height', 1080)}"
+        record = ExportRecord(format=ext, size_preset=size_preset, file_name=job['download_name'], file_size=size)
+        await db.export_history.insert_one(record.model_dump())
+
+async def purge_export_jobs() -> int:
+    """Delete finished jobs older than the retention period with their files, plus orphaned files."""
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=EXPORT_JOB_RETENTION_HOURS)
+    expired = await db.export_jobs.find(
+        {"status": {"$in": ["done", "failed"]}, "updated_at": {"$lt": cutoff.isoformat()}},
+        {"_id": 0, "id": 1, "result_file": 1}).to_list(None)
+    for job in expired:
+        if job.get("result_file"):
+            (EXPORT_JOBS_DIR / job["result_file"]).unlink(missing_ok=True)
+        export_job_html_path(job["id"]).unlink(missing_ok=True)
+        await db.export_jobs.delete_one({"id": job["id"]})
+    if EXPORT_JOBS_DIR.is_dir():
+        live = {j["id"] for j in await db.export_jobs.find({}, {"_id": 0, "id": 1}).to_list(None)}
+        for path in EXPORT_JOBS_DIR.iterdir():
+            # result and HTML files are named "<job id>.<ext>" or "<job id>_<file name>"
+            if path.name[:36] not in live and path.stat().st_mtime < cutoff.timestamp():
+                path.unlink(missing_ok=True)
+    return len(expired)
+
+async def sweep_export_jobs():
+    while True:
+        try:
+            purged = await purge_export_jobs()
+            if purged:
+                logger.info(f"Purged {purged} expired export job(s)")
+        except Exception as e:
+            logger.warning(f"Export job sweep failed: {e}")
+        await asyncio.sleep(EXPORT_JOB_SWEEP_INTERVAL_S)
+
+async def resume_export_jobs():
+    pending = await db.export_jobs.find({"status": {"$in": ["queued", "rendering", "zipping"]}}, {"_id": 0, "id": 1}).to_list(1000)
+    for job in pending:
+        schedule_export_job(job["id"])
+    if pending:
+        logger.info(f"Resumed {len(pending)} unfinished export job(s)")
+
+@api_router.post("/export/jobs")
+async def create_export_job(req: BatchExportRequest):
+    if not req.presets:
+        raise HTTPException(400, "En az bir preset gerekli")
+    date_str = datetime.now().strftime('%Y%m%d')
+    safe_name = req.catalog_name.replace(' ', '_')[:30]
+    file_names = batch_file_names(req.presets, safe_name, date_str)
+    job = ExportJob(
+        request=req.model_dump(exclude={"html_content"}),
+        html_hash=hashlib.sha256(req.html_content.encode('utf-8')).hexdigest(),
+        progress=[{"label": p.get('label', ''), "file_name": f, "status": "pending"} for p, f in zip(req.presets, file_names)],
+        total=len(file_names),
+        download_name=file_names[0] if len(file_names) == 1 else f"{safe_name}_{date_str}_batch.zip",
+    )
+    EXPORT_JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    async with aiofiles.open(export_job_html_path(job.id), 'w', encoding='utf-8') as f:
+        await f.write(req.html_content)
+    doc = job.model_dump()
+    await db.export_jobs.insert_one(doc)
+    schedule_export_job(job.id)
+    doc.pop('_id', None)
+    doc.pop('request', None)
+    return doc
+
+@api_router.get("/export/jobs/{job_id}")
+async def get_export_job(job_id: str):
+    job = await db.export_jobs.find_one({"id": job_id}, {"_id": 0, "request": 0})
+    if not job:
+        raise HTTPException(404, "Export isi bulunamadi")
+    return job
+
+@api_router.get("/export/jobs/{job_id}/result")
+async def get_export_job_result(job_id: str):
+    job = await db.export_jobs.find_one({"id": job_id}, {"_id": 0, "request": 0})
+    if not job:
+        raise HTTPException(404, "Export isi bulunamadi")
+    if job.get('status') != 'done':
+        raise HTTPException(409, f"Export isi henuz tamamlanmadi: {job.get('status')}")
+    path = EXPORT_JOBS_DIR / job['result_file']
+    if not path.is_file():
+        raise HTTPException(410, "Export dosyasi artik mevcut degil")
+    media_type = EXPORT_MEDIA_TYPES.get(path.suffix.lstrip('.'), "application/octet-stream")
+    return FileResponse(path, media_type=media_type, filename=job['download_name'])
 
 # ==================== EXPORT HISTORY ====================
 @api_router.get("/export-history")
@@ -913,46 +3621,212 @@ async def get_export_history(limit: int = 50):
     return records
 
 # ==================== BACKUP / RESTORE ====================
+# v1: one catalog in project.json with images inlined as data URIs.
+# v2: documents as JSON lines (catalogs.jsonl, cards.jsonl, assets.jsonl) that keep
+# their /api/blobs/<hash> refs, plus every referenced image once as blobs/<hash>.<ext>.
+# Both directions stream: export reads Mongo cursors into the ZIP stream, import
+# reads entries in batches and writes them with bulk upserts. A library backup can
+# be incremental: given the previous manifest it only contains documents changed
+# since then and images not already listed there. Deleted documents are not tracked.
+BACKUP_COLLECTIONS = {"catalogs": "updated_at", "cards": "updated_at", "assets": "created_at"}
+BACKUP_BATCH_DOCS = 500
+BLOB_EXTENSIONS = {'image/png': 'png', 'image/jpeg': 'jpg', 'image/webp': 'webp', 'image/gif': 'gif',
+                   'image/avif': 'avif', 'image/svg+xml': 'svg'}
+
+
+def backup_manifest(version: str, **extra) -> dict:
+    return {"version": version, "created_at": datetime.now(timezone.utc).isoformat(), "app": "Pro Creative Studio", **extra}
+
+
+async def jsonl_docs(cursor, blob_hashes: set, counts: Dict[str, int], coll_name: str) -> AsyncIterator[bytes]:
+    """JSON lines from a cursor in ~ZIP_JSON_CHUNK_BYTES pieces, collecting the blob refs seen."""
+    buf, size = [], 0
+    async for doc in cursor:
+        doc.pop("search_keys", None)  # rebuilt on import
+        line = json.dumps(doc, ensure_ascii=False, default=str)
+        blob_hashes.update(BLOB_REF_RE.findall(line))
+        counts[coll_name] = counts.get(coll_name, 0) + 1
+        buf.append(line)
+        size += len(line)
+        if size >= ZIP_JSON_CHUNK_BYTES:
+            yield ('\n'.join(buf) + '\n').encode('utf-8')
+            buf, size = [], 0
+    if buf:
+        yield ('\n'.join(buf) + '\n').encode('utf-8')
+
+
+async def backup_v2_entries(queries: Dict[str, dict], manifest: dict, known_blobs: set):
+    referenced: set = set()
+    counts: Dict[str, int] = {}
+    for coll_name, query in queries.items():
+        yield f"{coll_name}.jsonl", jsonl_docs(db[coll_name].find(query, {"_id": 0}), referenced, counts, coll_name)
+    yield "themes.json", json_chunks(await db.themes.find({}, {"_id": 0}).to_list(None))
+    yield "glossary.json", json_chunks(await db.glossary.find({}, {"_id": 0}).to_list(None))
+    written, missing = [], []
+    for blob_hash in sorted(referenced - known_blobs):
+        try:
+            data = await read_blob(blob_hash)
+        except OSError:
+            missing.append(blob_hash)
+            continue
+        written.append(blob_hash)
+        yield f"blobs/{blob_hash}.{BLOB_EXTENSIONS.get(sniff_image_mime(data), 'bin')}", data
+    # Written last: only now are the document counts and the blob list known
+    manifest.update(counts=counts, blobs_written=len(written), missing_blobs=missing,
+                    blobs=sorted(known_blobs | set(written)))
+    yield "manifest.json", json_chunks(manifest)
+
+
+def backup_response(entries, file_name: str) -> StreamingResponse:
+    return StreamingResponse(stream_zip(entries), media_type="application/zip",
+                             headers={"Content-Disposition": f"attachment; filename={file_name}"})
+
+
 @api_router.post("/backup/export/{catalog_id}")
-async def backup_export(catalog_id: str):
-    cat = await db.catalogs.find_one({"id": catalog_id}, {"_id": 0})
+async def backup_export(catalog_id: str, version: int = 2):
+    """Back up one catalog; version=1 produces the legacy self-contained format."""
+    if version == 1:
+        cat = await db.catalogs.find_one({"id": catalog_id}, {"_id": 0})
+        if not cat:
+            raise HTTPException(404, "Katalog bulunamadi")
+        # v1 backups stay self-contained: blob refs are inlined as data URIs
+        cat = await inline_images(cat)
+        themes = await db.themes.find({}, {"_id": 0}).to_list(100)
+        glossary_terms = await db.glossary.find({}, {"_id": 0}).to_list(500)
+        manifest = backup_manifest("1.0")
+
+        async def entries():
+            yield "project.json", json_chunks(cat)
+            yield "themes.json", json_chunks(themes)
+            yield "glossary.json", json_chunks(glossary_terms)
+            yield "manifest.json", json_chunks(manifest)
+        safe_name = cat.get('name', 'backup').replace(' ', '_')[:30]
+        return backup_response(entries(), f"backup_{safe_name}_{datetime.now().strftime('%Y%m%d')}.zip")
+
+    cat = await db.catalogs.find_one({"id": catalog_id}, {"_id": 0, "name": 1})
     if not cat:
         raise HTTPException(404, "Katalog bulunamadi")
-    themes = await db.themes.find({}, {"_id": 0}).to_list(100)
-    glossary_terms = await db.glossary.find({}, {"_id": 0}).to_list(500)
-    manifest = {"version": "1.0", "created_at": datetime.now(timezone.utc).isoformat(), "app": "Pro Creative Studio"}
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-        zf.writestr("project.json", json.dumps(cat, ensure_ascii=False, indent=2))
-        zf.writestr("themes.json", json.dumps(themes, ensure_ascii=False, indent=2))
-        zf.writestr("glossary.json", json.dumps(glossary_terms, ensure_ascii=False, indent=2))
-        zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
-    zip_buffer.seek(0)
     safe_name = cat.get('name', 'backup').replace(' ', '_')[:30]
-    return StreamingResponse(zip_buffer, media_type="application/zip",
-        headers={"Content-Disposition": f"attachment; filename=backup_{safe_name}_{datetime.now().strftime('%Y%m%d')}.zip"})
+    manifest = backup_manifest("2.0", scope="catalog", catalog_id=catalog_id)
+    return backup_response(backup_v2_entries({"catalogs": {"id": catalog_id}}, manifest, set()),
+                           f"backup_{safe_name}_{datetime.now().strftime('%Y%m%d')}.zip")
+
+
+@api_router.post("/backup/export")
+async def backup_export_library(base_manifest: Optional[dict] = Body(None)):
+    """Back up all catalogs, cards and assets; post a previous library manifest for an incremental backup."""
+    since, known_blobs = None, set()
+    if base_manifest:
+        if not str(base_manifest.get("version", "")).startswith("2") or base_manifest.get("scope") != "library":
+            raise HTTPException(400, "Gecersiz temel manifest")
+        since = base_manifest.get("created_at")
+        known_blobs = {h for h in base_manifest.get("blobs", []) if BLOB_HASH_RE.match(h)}
+    queries = {coll_name: ({field: {"$gt": since}} if since else {}) for coll_name, field in BACKUP_COLLECTIONS.items()}
+    manifest = backup_manifest("2.0", scope="library", since=since)
+    kind = "incremental" if since else "full"
+    return backup_response(backup_v2_entries(queries, manifest, known_blobs),
+                           f"backup_library_{kind}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip")
+
+
+def read_jsonl_batch(fh, limit: int) -> List[dict]:
+    docs = []
+    while len(docs) < limit:
+        line = fh.readline()
+        if not line:
+            break
+        if line.strip():
+            docs.append(json.loads(line))
+    return docs
+
+
+def prepare_import_doc(coll_name: str, doc: dict, mode: str) -> dict:
+    doc.pop("_id", None)
+    if mode == "new":
+        doc["id"] = str(uuid.uuid4())
+        if coll_name == "catalogs":
+            doc["name"] = f"{doc.get('name', 'Import')} (Import)"
+            for p in doc.get('pages', []):
+                p['id'] = str(uuid.uuid4())
+    doc["search_keys"] = search_keys(doc, SEARCH_FIELDS[coll_name])
+    return doc
+
+
+async def import_settings(themes_data: List[dict], glossary_data: List[dict]):
+    themes = [ReplaceOne({"id": t["id"]}, t, upsert=True) for t in themes_data if not t.get('is_preset')]
+    if themes:
+        await db.themes.bulk_write(themes, ordered=False)
+    if glossary_data:
+        await db.glossary.bulk_write([ReplaceOne({"id": t["id"]}, t, upsert=True) for t in glossary_data], ordered=False)
+        await bump_glossary_version()
+
+
+async def import_backup_v2(zf: zipfile.ZipFile, mode: str) -> dict:
+    names = zf.namelist()
+    # Images first, so no imported document ever points at a missing blob
+    blobs_added, blobs_skipped = 0, 0
+    for name in names:
+        if not name.startswith("blobs/"):
+            continue
+        blob_hash = name[len("blobs/"):].split('.', 1)[0]
+        if not BLOB_HASH_RE.match(blob_hash):
+            continue
+        # An existing blob is about to be referenced again; a blob GC just deleted is re-added.
+        if blob_path(blob_hash).is_file() and await touch_blobs([blob_hash]):
+            blobs_skipped += 1
+            continue
+        data = await asyncio.to_thread(zf.read, name)
+        if hashlib.sha256(data).hexdigest() != blob_hash:
+            raise HTTPException(400, f"Gecersiz backup dosyasi: bozuk gorsel {blob_hash}")
+        await put_blob(data)
+        blobs_added += 1
+    imported: Dict[str, int] = {}
+    first_catalog = None
+    for coll_name in BACKUP_COLLECTIONS:
+        if f"{coll_name}.jsonl" not in names:
+            continue
+        with zf.open(f"{coll_name}.jsonl") as raw:
+            fh = io.TextIOWrapper(raw, encoding='utf-8')
+            while True:
+                docs = await asyncio.to_thread(read_jsonl_batch, fh, BACKUP_BATCH_DOCS)
+                if not docs:
+                    break
+                docs = [prepare_import_doc(coll_name, d, mode) for d in docs]
+                await db[coll_name].bulk_write([ReplaceOne({"id": d["id"]}, d, upsert=True) for d in docs], ordered=False)
+                imported[coll_name] = imported.get(coll_name, 0) + len(docs)
+                if coll_name == "catalogs" and first_catalog is None:
+                    first_catalog = docs[0]["id"]
+    themes_data = json.loads(zf.read("themes.json")) if "themes.json" in names else []
+    glossary_data = json.loads(zf.read("glossary.json")) if "glossary.json" in names else []
+    await import_settings(themes_data, glossary_data)
+    return {"message": "Proje yuklendi", "catalog_id": first_catalog, "imported": imported,
+            "blobs_added": blobs_added, "blobs_existing": blobs_skipped}
+
 
 @api_router.post("/backup/import")
 async def backup_import(file: UploadFile = File(...), mode: str = Form("new")):
-    contents = await file.read()
+    check_upload_size(file, BACKUP_MAX_BYTES)
     try:
-        with zipfile.ZipFile(io.BytesIO(contents)) as zf:
+        zf = zipfile.ZipFile(file.file)
+        if sum(info.file_size for info in zf.infolist()) > BACKUP_MAX_BYTES:
+            raise ValueError("acilmis boyut limiti asildi")
+        manifest = json.loads(zf.read("manifest.json")) if "manifest.json" in zf.namelist() else {}
+    except Exception as e:
+        raise HTTPException(400, f"Gecersiz backup dosyasi: {str(e)}")
+    with zf:
+        if str(manifest.get("version", "1")).startswith("2"):
+            try:
+                return await import_backup_v2(zf, mode)
+            except (ValueError, KeyError, zipfile.BadZipFile) as e:
+                raise HTTPException(400, f"Gecersiz backup dosyasi: {str(e)}")
+        try:
             project_data = json.loads(zf.read("project.json"))
             themes_data = json.loads(zf.read("themes.json")) if "themes.json" in zf.namelist() else []
             glossary_data = json.loads(zf.read("glossary.json")) if "glossary.json" in zf.namelist() else []
-    except Exception as e:
-        raise HTTPException(400, f"Gecersiz backup dosyasi: {str(e)}")
-    if mode == "new":
-        project_data["id"] = str(uuid.uuid4())
-        project_data["name"] = f"{project_data.get('name', 'Import')} (Import)"
-        for p in project_data.get('pages', []):
-            p['id'] = str(uuid.uuid4())
+        except Exception as e:
+            raise HTTPException(400, f"Gecersiz backup dosyasi: {str(e)}")
+    project_data = prepare_import_doc("catalogs", await externalize_images(project_data), mode)
     await db.catalogs.replace_one({"id": project_data["id"]}, project_data, upsert=True)
-    for theme in themes_data:
-        if not theme.get('is_preset'):
-            await db.themes.replace_one({"id": theme["id"]}, theme, upsert=True)
-    for term in glossary_data:
-        await db.glossary.replace_one({"id": term["id"]}, term, upsert=True)
+    await import_settings(themes_data, glossary_data)
     return {"message": "Proje yuklendi", "catalog_id": project_data["id"]}
 
 # ==================== TAGS ====================
@@ -962,6 +3836,31 @@ async def get_tags():
     result = await db.catalogs.aggregate(pipeline).to_list(100)
     return [item["_id"] for item in result]
 
+# ==================== RUNTIME METRICS ====================
+@api_router.get("/system/metrics")
+async def get_system_metrics():
+    return {"event_loop": _loop_monitor.stats(), "image_pool": _image_pool.stats(), "rembg_pool": _rembg_pool.stats()}
+
+# ==================== INDEX STATUS ====================
+@api_router.get("/db/indexes")
+async def get_index_status():
+    collections = {}
+    for coll_name, specs in INDEXES.items():
+        present = await db[coll_name].index_information()
+        declared = [index_name(keys) for keys, _ in specs]
+        collections[coll_name] = {"present": sorted(present), "missing": [n for n in declared if n not in present]}
+    plans = {}
+    for name, (coll_name, query, sort) in HOT_QUERIES.items():
+        cmd = {"find": coll_name, "filter": query, "limit": LIST_PAGE_SIZE}
+        if sort:
+            cmd["sort"] = sort
+        try:
+            explain = await db.command({"explain": cmd, "verbosity": "queryPlanner"})
+            plans[name] = summarize_plan(explain["queryPlanner"]["winningPlan"])
+        except Exception as e:
+            plans[name] = {"error": str(e)}
+    return {"collections": collections, "plans": plans}
+
 # ==================== INCLUDE ROUTER ====================
 app.include_router(api_router)
 
@@ -971,13 +3870,19 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Export-Cache", "Retry-After", "Content-Disposition", "ETag"],
 )
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    global _browser, _playwright
-    if _browser:
-        await _browser.close()
+    global _playwright
+    _loop_monitor.stop()
+    if _export_job_sweeper:
+        _export_job_sweeper.cancel()
+    await _render_scheduler.close()
+    _image_pool.shutdown()
+    _rembg_pool.shutdown()
+    await _translation_provider.close()
     if _playwright:
         await _playwright.stop()
     client.close()
@@ -0,0 +1,39 @@
+// Field-mask diff for page content autosave (PATCH /catalogs/:id/pages/:pageId).
+// Plain objects are diffed key by key; arrays of the same length element by
+// element; anything else that changed is sent whole.
+
+const isPlainObject = (v) => v !== null && typeof v === "object" && !Array.isArray(v);
+
+const SAFE_KEY = /^[A-Za-z0-9_-]+$/;
+
+function diffInto(prev, next, path, patch) {
+  if (prev === next) return;
+  if (isPlainObject(prev) && isPlainObject(next)) {
+    const keys = new Set([...Object.keys(prev), ...Object.keys(next)]);
+    if ([...keys].some((k) => !SAFE_KEY.test(k))) { patch.set[path] = next; return; }
+    keys.forEach((k) => {
+      const sub = `${path}.${k}`;
+      if (!(k in next) || next[k] === undefined) { if (k in prev) patch.unset.push(sub); }
+      else diffInto(prev[k], next[k], sub, patch);
+    });
+    return;
+  }
+  if (Array.isArray(prev) && Array.isArray(next) && prev.length === next.length) {
+    next.forEach((item, i) => diffInto(prev[i], item, `${path}.${i}`, patch));
+    return;
+  }
+  if (JSON.stringify(prev) !== JSON.stringify(next)) patch.set[path] = next;
+}
+
+export function contentPatch(prev, next) {
+  const patch = { set: {}, unset: [] };
+  const keys = new Set([...Object.keys(prev || {}), ...Object.keys(next || {})]);
+  if ([...keys].some((k) => !SAFE_KEY.test(k))) return null;
+  keys.forEach((k) => {
+    if (!(k in next) || next[k] === undefined) { if (k in prev) patch.unset.push(k); }
+    else diffInto(prev[k], next[k], k, patch);
+  });
+  return patch;
+}
+
+export const isEmptyPatch = (patch) => Object.keys(patch.set).length === 0 && patch.unset.length === 0;
@@ -32,17 +32,39 @@ export default function Dashboard() {
   const [showDeleteDialog, setShowDeleteDialog] = useState(false);
   const [deleteTarget, setDeleteTarget] = useState(null);
   const [activeTab, setActiveTab] = useState("catalogs");
+  const [catalogCursor, setCatalogCursor] = useState(null);
+  const [cardCursors, setCardCursors] = useState({ greeting: null, condolence: null });
+
+  const catalogQuery = (cursor) => {
+    const params = {};
+    if (searchTerm) params.search = searchTerm;
+    if (selectedTag) params.tag = selectedTag;
+    if (cursor) params.cursor = cursor;
+    return params;
+  };
+
+  const cardQuery = (type, cursor) => {
+    const params = { card_type: type };
+    if (cursor) params.cursor = cursor;
+    return params;
+  };
 
   const fetchAll = async () => {
     try {
       setLoading(true);
-      const [catRes, cardRes, tagRes] = await Promise.all([
-        axios.get(`${API}/catalogs${searchTerm ? `?search=${searchTerm}` : ''}${selectedTag ? `${searchTerm ? '&' : '?'}tag=${selectedTag}` : ''}`),
-        axios.get(`${API}/cards`),
+      const [catRes, greetingRes, condolenceRes, tagRes] = await Promise.all([
+        axios.get(`${API}/catalogs`, { params: catalogQuery() }),
+        axios.get(`${API}/cards`, { params: cardQuery('greeting') }),
+        axios.get(`${API}/cards`, { params: cardQuery('condolence') }),
         axios.get(`${API}/tags`).catch(() => ({ data: [] }))
       ]);
       setCatalogs(catRes.data);
-      setCards(cardRes.data);
+      setCatalogCursor(catRes.headers['x-next-cursor'] || null);
+      setCards([...greetingRes.data, ...condolenceRes.data]);
+      setCardCursors({
+        greeting: greetingRes.headers['x-next-cursor'] || null,
+        condolence: condolenceRes.headers['x-next-cursor'] || null,
+      });
       setTags(tagRes.data);
     } catch { toast.error("Veriler yuklenemedi"); }
     finally { setLoading(false); }
@@ -50,6 +72,22 @@ export default function Dashboard() {
 
   useEffect(() => { fetchAll(); }, [searchTerm, selectedTag]);
 
+  const loadMoreCatalogs = async () => {
+    try {
+      const res = await axios.get(`${API}/catalogs`, { params: catalogQuery(catalogCursor) });
+      setCatalogs(prev => [...prev, ...res.data]);
+      setCatalogCursor(res.headers['x-next-cursor'] || null);
+    } catch { toast.error("Veriler yuklenemedi"); }
+  };
+
+  const loadMoreCards = async (type) => {
+    try {
+      const res = await axios.get(`${API}/cards`, { params: cardQuery(type, cardCursors[type]) });
+      setCards(prev => [...prev, ...res.data]);
+      setCardCursors(prev => ({ ...prev, [type]: res.headers['x-next-cursor'] || null }));
+    } catch { toast.error("Veriler yuklenemedi"); }
+  };
+
   const handleCreateCatalog = async () => {
     if (!newCatalog.name.trim()) { toast.error("Katalog adi gerekli"); return; }
     try {
@@ -211,7 +249,7 @@ export default function Dashboard() {
                       </div>
                     </div>
                     <div className="flex items-center gap-3 text-xs text-zinc-500 mb-2">
-                      <span className="flex items-center gap-1"><Layers className="w-3 h-3" />{cat.pages?.length || 0} sayfa</span>
+                      <span className="flex items-center gap-1"><Layers className="w-3 h-3" />{cat.page_count ?? cat.pages?.length ?? 0} sayfa</span>
                       <span className="flex items-center gap-1"><Clock className="w-3 h-3" />{formatDate(cat.updated_at)}</span>
                     </div>
                     {cat.tags?.length > 0 && (
@@ -221,6 +259,11 @@ export default function Dashboard() {
                 ))}
               </div>
             )}
+            {!loading && catalogCursor && (
+              <div className="flex justify-center mt-6">
+                <Button variant="outline" className="border-zinc-700 text-zinc-300" onClick={loadMoreCatalogs} data-testid="load-more-catalogs">Daha fazla yukle</Button>
+              </div>
+            )}
           </TabsContent>
 
           {['greeting', 'condolence'].map(type => (
@@ -251,6 +294,11 @@ export default function Dashboard() {
                   ))}
                 </div>
               )}
+              {cardCursors[type] && (
+                <div className="flex justify-center mt-6">
+                  <Button variant="outline" className="border-zinc-700 text-zinc-300" onClick={() => loadMoreCards(type)}>Daha fazla yukle</Button>
+                </div>
+              )}
             </TabsContent>
           ))}
         </Tabs>
@@ -21,8 +21,11 @@ import {
 } from "lucide-react";
 import { TEMPLATES, TEMPLATE_CATEGORIES, generateTemplateHTML, DEFAULT_THEME } from "@/lib/templateEngine";
 import { normalizeCatalog, normalizeContent, DEFAULT_FIELD_BOXES, DEFAULT_SHAPE_LAYERS, DEFAULT_LAYER_GROUPS } from "@/lib/catalogSchema";
+import { contentPatch, isEmptyPatch } from "@/lib/contentPatch";
 
 const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
+const BLOB_REF_RE = /(\/api\/blobs\/[0-9a-f]{64})(?:\?w=\d+)?/g;
+const PREVIEW_IMAGE_WIDTH = 1280;
 
 const FONT_OPTIONS = [
   { id: "inherit", name: "Varsayilan" },
@@ -173,6 +176,7 @@ export default function Editor() {
   const fileInputRef = useRef(null);
   const overlayInputRef = useRef(null);
   const previewRef = useRef(null);
+  const savedContentRef = useRef({});
 
   const [catalog, setCatalog] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -212,6 +216,7 @@ export default function Editor() {
 
   // Translation state
   const [translating, setTranslating] = useState(false);
+  const [translatingCatalog, setTranslatingCatalog] = useState(false);
   const [sourceLang, setSourceLang] = useState('EN');
   const [targetLang, setTargetLang] = useState('TR');
   const [translationTone, setTranslationTone] = useState('corporate');
@@ -245,6 +250,7 @@ export default function Editor() {
   const [exportQuality, setExportQuality] = useState('high');
   const [jpegQuality, setJpegQuality] = useState(90);
   const [batchMode, setBatchMode] = useState(false);
+  const [catalogPdfMode, setCatalogPdfMode] = useState(false);
   const [batchPresets, setBatchPresets] = useState({ 'a4-portrait': true, '1080x1080': true, '1080x1350': true, '1200x628': true, '1920x1080': false });
 
   const [removingBg, setRemovingBg] = useState(false);
@@ -261,6 +267,7 @@ export default function Editor() {
         axios.get(`${API}/themes`)
       ]);
       const normalized = normalizeCatalog(catRes.data);
+      savedContentRef.current = Object.fromEntries((catRes.data.pages || []).map(pg => [pg.id, pg.content || {}]));
       setCatalog(normalized);
       setThemes(themeRes.data);
       const ct = themeRes.data.find(t => t.id === catRes.data.theme_id);
@@ -278,6 +285,8 @@ export default function Editor() {
   const currentTemplateId = selectedPage?.content?.template_id || 'industrial-product-alert';
   const activeEffects = selectedPage?.content?.effects || effects;
   const previewHTML = selectedPage ? generateTemplateHTML(currentTemplateId, selectedPage.content, activeTheme, activeEffects) : '';
+  // The canvas shows screen-sized derivatives; exports send previewHTML and the backend picks print-sized ones.
+  const canvasHTML = previewHTML.replace(BLOB_REF_RE, `$1?w=${PREVIEW_IMAGE_WIDTH}`);
 
   const updatePageContent = (field, value) => {
     if (!selectedPage) return;
@@ -346,20 +355,40 @@ export default function Editor() {
     if (selectedPage.content?.effects) setEffects(selectedPage.content.effects);
     setSelectedGuide(null);
   }, [selectedPageId]);
+  // Page writes send the catalog version in If-Match; the backend answers with the new one in ETag.
+  const versionHeaders = () => (catalog?.version != null ? { 'If-Match': `"${catalog.version}"` } : {});
+  const syncVersion = (r) => {
+    const v = parseInt(String(r.headers?.etag || '').replace(/\D/g, ''), 10);
+    if (!Number.isNaN(v)) setCatalog(p => p && { ...p, version: v });
+  };
+
+  // Sends only the changed content paths when the last saved copy is known, the full content otherwise.
+  const persistPage = async (page) => {
+    const url = `${API}/catalogs/${catalogId}/pages/${page.id}`;
+    const saved = savedContentRef.current[page.id];
+    const patch = saved && contentPatch(saved, page.content);
+    if (patch && isEmptyPatch(patch)) return;
+    const r = patch
+      ? await axios.patch(url, patch, { headers: versionHeaders() })
+      : await axios.put(url, { content: page.content }, { headers: versionHeaders() });
+    syncVersion(r);
+    savedContentRef.current[page.id] = page.content;
+  };
+
   const savePage = async () => {
     if (!selectedPage) return;
-    try { setSaving(true); await axios.put(`${API}/catalogs/${catalogId}/pages/${selectedPageId}`, { content: selectedPage.content }); toast.success("Kaydedildi"); }
-    catch { toast.error("Kaydedilemedi"); } finally { setSaving(false); }
+    try { setSaving(true); await persistPage(selectedPage); toast.success("Kaydedildi"); }
+    catch (e) { toast.error(e.response?.status === 409 ? "Katalog baska bir oturumda degistirildi, sayfayi yenileyin" : "Kaydedilemedi"); } finally { setSaving(false); }
   };
 
   const addPage = async () => {
-    try { const r = await axios.post(`${API}/catalogs/${catalogId}/pages`); setCatalog(p => ({...p, pages:[...p.pages, r.data]})); setSelectedPageId(r.data.id); toast.success("Sayfa eklendi"); }
+    try { const r = await axios.post(`${API}/catalogs/${catalogId}/pages`); syncVersion(r); savedContentRef.current[r.data.id] = r.data.content; setCatalog(p => ({...p, pages:[...p.pages, r.data]})); setSelectedPageId(r.data.id); toast.success("Sayfa eklendi"); }
     catch { toast.error("Eklenemedi"); }
   };
 
   const deletePage = async (pid) => {
     if (catalog.pages.length <= 1) { toast.error("En az 1 sayfa"); return; }
-    try { await axios.delete(`${API}/catalogs/${catalogId}/pages/${pid}`); setCatalog(p => ({...p, pages:p.pages.filter(pg=>pg.id!==pid)})); if (selectedPageId === pid) setSelectedPageId(catalog.pages.find(pg=>pg.id!==pid)?.id); toast.success("Silindi"); }
+    try { const r = await axios.delete(`${API}/catalogs/${catalogId}/pages/${pid}`, { headers: versionHeaders() }); syncVersion(r); setCatalog(p => ({...p, pages:p.pages.filter(pg=>pg.id!==pid)})); if (selectedPageId === pid) setSelectedPageId(catalog.pages.find(pg=>pg.id!==pid)?.id); toast.success("Silindi"); }
     catch { toast.error("Silinemedi"); }
   };
 
@@ -368,7 +397,7 @@ export default function Editor() {
     if (!selectedPage) return;
     // Save current content before switching
     try {
-      await axios.put(`${API}/catalogs/${catalogId}/pages/${selectedPageId}`, { content: selectedPage.content });
+      await persistPage(selectedPage);
     } catch(e) { /* continue even if save fails */ }
     // Only change template_id, preserve ALL other content
     updatePageContent('template_id', tid);
@@ -391,7 +420,9 @@ export default function Editor() {
         else overlays.push({ id: `ov-${Date.now()}`, image_data: r.data.image_data, x: 50, y: 50, width: 30, height: 30, fit: 'contain', opacity: 100, rotation: 0, zIndex: 6 });
         updateOverlays(overlays);
       }
-      toast.success("Yuklendi");
+      if (r.data.duplicate) toast.success("Yuklendi - ayni gorsel zaten kayitliydi, mevcut kopya kullanildi");
+      else if (r.data.similar?.length) toast.success("Yuklendi - cok benzer bir gorsel zaten kayitli");
+      else toast.success("Yuklendi");
     } catch { toast.error("Yuklenemedi"); }
     finally { e.target.value = ''; }
   };
@@ -435,6 +466,17 @@ export default function Editor() {
     catch(e) { toast.error(e.response?.data?.detail || "Hata"); } finally { setTranslating(false); }
   };
 
+  // Translates every page's text fields in one backend call; the server writes the results, so reload afterwards.
+  const translateCatalog = async () => {
+    setTranslatingCatalog(true);
+    try {
+      if (selectedPage) await persistPage(selectedPage);
+      const r = await axios.post(`${API}/translate/batch`, {catalog_id:catalogId, source_lang:sourceLang, target_lang:targetLang, tone:translationTone});
+      await fetchCatalog();
+      toast.success(r.data.skipped?.length ? `Katalog cevrildi (${r.data.skipped.length} alan degistigi icin atlandi)` : "Katalog cevrildi");
+    } catch(e) { toast.error(e.response?.data?.detail || "Hata"); } finally { setTranslatingCatalog(false); }
+  };
+
   const applyTranslation = () => {
     if (!translateResult || !translateField) return;
     updatePageContent(translateField, translateField === 'bullet_points' ? translateResult.split('\n').filter(Boolean) : translateResult);
@@ -444,15 +486,29 @@ export default function Editor() {
   const doExport = async () => {
     if (!previewHTML) return; setExporting(true);
     try {
-      if (batchMode) {
+      if (catalogPdfMode) {
+        const pages_html = Object.fromEntries((catalog?.pages || []).map(pg => [pg.id, generateTemplateHTML(pg.content?.template_id || 'industrial-product-alert', pg.content, activeTheme, pg.content?.effects || effects)]));
+        const r = await axios.post(`${API}/export/catalog/${catalogId}/pdf`, {pages_html,width:210,height:297,debug_html:exportDebugHtml},{responseType:'blob',timeout:120000});
+        const url = window.URL.createObjectURL(new Blob([r.data])); const a = document.createElement('a'); a.href=url; a.download=`${catalog?.product_name||'katalog'}_tum_sayfalar.pdf`; document.body.appendChild(a); a.click(); a.remove();
+        toast.success("Katalog PDF indirildi");
+      } else if (batchMode) {
         const presets = [];
         if (batchPresets['a4-portrait']) presets.push({format:'pdf',width:210,height:297,is_mm:true,label:'A4Portrait'});
         if (batchPresets['1080x1080']) presets.push({format:'png',width:1080,height:1080,is_mm:false,label:'1080x1080',quality:jpegQuality,optimize:exportQuality==='web'});
         if (batchPresets['1080x1350']) presets.push({format:'png',width:1080,height:1350,is_mm:false,label:'1080x1350',quality:jpegQuality,optimize:exportQuality==='web'});
         if (batchPresets['1200x628']) presets.push({format:'png',width:1200,height:628,is_mm:false,label:'1200x628',quality:jpegQuality,optimize:exportQuality==='web'});
         if (batchPresets['1920x1080']) presets.push({format:'png',width:1920,height:1080,is_mm:false,label:'1920x1080',quality:jpegQuality,optimize:exportQuality==='web'});
-        const r = await axios.post(`${API}/export/batch`, {html_content:previewHTML,presets,catalog_name:catalog?.product_name||catalog?.name||'export',debug_html:exportDebugHtml},{responseType:'blob',timeout:120000});
-        const url = window.URL.createObjectURL(new Blob([r.data])); const a = document.createElement('a'); a.href=url; a.download=`batch_${new Date().toISOString().slice(0,10)}.zip`; document.body.appendChild(a); a.click(); a.remove();
+        const job = await axios.post(`${API}/export/jobs`, {html_content:previewHTML,presets,catalog_name:catalog?.product_name||catalog?.name||'export',debug_html:exportDebugHtml});
+        let status = job.data;
+        while (status.status !== 'done') {
+          if (status.status === 'failed') throw new Error(status.error);
+          await new Promise(res => setTimeout(res, 1000));
+          status = (await axios.get(`${API}/export/jobs/${job.data.id}`)).data;
+        }
+        const r = await axios.get(`${API}/export/jobs/${job.data.id}/result`, {responseType:'blob'});
+        const disposition = /filename\*?=(?:UTF-8'')?"?([^";]+)"?/i.exec(r.headers['content-disposition'] || '');
+        const fileName = status.download_name || (disposition && decodeURIComponent(disposition[1])) || `batch_${new Date().toISOString().slice(0,10)}.zip`;
+        const url = window.URL.createObjectURL(new Blob([r.data])); const a = document.createElement('a'); a.href=url; a.download=fileName; document.body.appendChild(a); a.click(); a.remove();
         toast.success("Toplu export tamamlandi");
       } else {
         const pm = {'a4-portrait':{w:210,h:297,mm:true},'a4-landscape':{w:297,h:210,mm:true,land:true},'1080x1080':{w:1080,h:1080},'1080x1350':{w:1080,h:1350},'1200x628':{w:1200,h:628},'1920x1080':{w:1920,h:1080}};
@@ -653,7 +709,7 @@ export default function Editor() {
           <div className="flex-1 p-6 flex items-start justify-center">
             <div className="relative max-w-[580px] w-full animate-fade-in">
               <div ref={previewRef} className="bg-white paper-shadow a4-ratio w-full overflow-hidden relative" data-testid="canvas-preview">
-                <div dangerouslySetInnerHTML={{ __html: previewHTML }} style={{ width: '100%', height: '100%' }} />
+                <div dangerouslySetInnerHTML={{ __html: canvasHTML }} style={{ width: '100%', height: '100%' }} />
                 {Object.entries(selectedPage?.content?.field_boxes || {}).map(([field, box]) => {
                   const visible = shouldShowGuide('field', field);
                   if (!visible) return null;
@@ -1141,9 +1197,12 @@ export default function Editor() {
           <DialogHeader><DialogTitle className="text-zinc-100">Disa Aktar</DialogTitle></DialogHeader>
           <p id="exp-d" className="sr-only">Export ayarlari</p>
           <div className="space-y-3 py-2">
-            <div className="flex gap-2"><Button variant={!batchMode?"default":"outline"} size="sm" className={!batchMode?'bg-[#004aad]':'border-zinc-700 text-zinc-400'} onClick={() => setBatchMode(false)}>Tekli</Button>
-              <Button variant={batchMode?"default":"outline"} size="sm" className={batchMode?'bg-[#004aad]':'border-zinc-700 text-zinc-400'} onClick={() => setBatchMode(true)}>Toplu (ZIP)</Button></div>
-            {!batchMode ? (<>
+            <div className="flex gap-2"><Button variant={!batchMode&&!catalogPdfMode?"default":"outline"} size="sm" className={!batchMode&&!catalogPdfMode?'bg-[#004aad]':'border-zinc-700 text-zinc-400'} onClick={() => { setBatchMode(false); setCatalogPdfMode(false); }}>Tekli</Button>
+              <Button variant={batchMode?"default":"outline"} size="sm" className={batchMode?'bg-[#004aad]':'border-zinc-700 text-zinc-400'} onClick={() => { setBatchMode(true); setCatalogPdfMode(false); }}>Toplu (ZIP)</Button>
+              <Button variant={catalogPdfMode?"default":"outline"} size="sm" className={catalogPdfMode?'bg-[#004aad]':'border-zinc-700 text-zinc-400'} onClick={() => { setCatalogPdfMode(true); setBatchMode(false); }} data-testid="catalog-pdf-mode-btn">Katalog PDF</Button></div>
+            {catalogPdfMode ? (
+              <p className="text-xs text-zinc-400">Tum sayfalar ({catalog?.pages?.length || 0}) tek A4 PDF olarak disa aktarilir.</p>
+            ) : !batchMode ? (<>
               <div><Label className="text-[10px] text-zinc-400">Format</Label>
                 <Select value={exportFormat} onValueChange={setExportFormat}><SelectTrigger className="bg-zinc-800 border-zinc-700 text-zinc-200"><SelectValue /></SelectTrigger>
                   <SelectContent className="bg-zinc-900 border-zinc-800"><SelectItem value="pdf">PDF</SelectItem><SelectItem value="png">PNG</SelectItem><SelectItem value="jpg">JPG</SelectItem></SelectContent></Select></div>
@@ -1193,6 +1252,9 @@ export default function Editor() {
             <Button onClick={doTranslate} disabled={translating} className="w-full bg-[#004aad] h-8 text-xs" data-testid="translate-btn">
               {translating ? <Loader2 className="w-3 h-3 mr-1 animate-spin" /> : <Languages className="w-3 h-3 mr-1" />}{translating ? 'Cevriliyor...' : 'Cevir'}
             </Button>
+            <Button variant="outline" onClick={translateCatalog} disabled={translatingCatalog} className="w-full h-8 text-xs border-zinc-700 text-zinc-300" data-testid="translate-catalog-btn">
+              {translatingCatalog ? <Loader2 className="w-3 h-3 mr-1 animate-spin" /> : <Languages className="w-3 h-3 mr-1" />}{translatingCatalog ? 'Katalog cevriliyor...' : 'Tum Katalogu Cevir'}
+            </Button>
             {translateResult && (<>
               <Textarea value={translateResult} onChange={(e) => setTranslateResult(e.target.value)} rows={4} className="text-xs bg-zinc-800 border-zinc-700 text-zinc-100" data-testid="translate-result" />
               <Button variant="outline" onClick={applyTranslation} className="w-full h-8 text-xs border-zinc-700 text-zinc-300" data-testid="apply-translation">Alana Uygula</Button>
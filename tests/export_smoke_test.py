@@ -5,12 +5,12 @@ from io import BytesIO
 from pathlib import Path
 import sys
 
-from PIL import Image
+from PIL import Image, ImageChops, ImageStat
 from pypdf import PdfReader
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'backend'))
 
-from server import render_html_to_pdf, render_html_to_image  # noqa: E402
+from server import render_html_to_pdf, render_html_to_image, render_html_to_images  # noqa: E402
 
 FIXTURE_PATH = Path(__file__).parent / 'fixtures' / 'export_fixtures.json'
 
@@ -85,6 +85,24 @@ def assert_pdf_marker(pdf_bytes: bytes, marker: str):
     assert marker in text, f'PDF marker bulunamadi: {marker}'
 
 
+def assert_images_match(expected: bytes, actual: bytes, label: str, max_mean_diff: float = 1.0):
+    a = Image.open(BytesIO(expected)).convert('RGB')
+    b = Image.open(BytesIO(actual)).convert('RGB')
+    assert a.size == b.size, f'{label}: boyut farkli {a.size} != {b.size}'
+    diff = sum(ImageStat.Stat(ImageChops.difference(a, b)).mean) / 3
+    assert diff <= max_mean_diff, f'{label}: render-once ciktisi farkli (ortalama piksel farki {diff:.2f})'
+
+
+async def check_render_once(sample):
+    """Render-once batch path must match the per-preset path pixel for pixel (within tolerance)."""
+    sizes = [tuple(sample['png_size']), (1200, 628), (1080, 1080)]
+    targets = [{'width': w, 'height': h, 'quality': 90, 'img_format': 'png'} for w, h in sizes]
+    batch = await render_html_to_images(sample['html'], targets)
+    for (w, h), got in zip(sizes, batch):
+        single = await render_html_to_image(sample['html'], width=w, height=h, img_format='png')
+        assert_images_match(single, got, f"{sample['name']} {w}x{h}")
+
+
 async def main():
     ensure_chromium_available()
     fixtures = load_fixtures()
@@ -114,6 +132,7 @@ async def main():
         img = Image.open(BytesIO(png))
         assert img.size == sample['png_size'], f"PNG boyutu hatali: {img.size} != {sample['png_size']}"
         assert_png_has_red_marker(png)
+        await check_render_once(sample)
 
     print(f'export_smoke_test: OK ({len(fixtures)} fixture render)')
 
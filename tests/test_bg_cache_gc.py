@@ -0,0 +1,101 @@
+import asyncio
+import io
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+from PIL import Image
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'catalog_test')
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'backend'))
+
+import server  # noqa: E402
+
+mongomock_motor = pytest.importorskip('mongomock_motor')
+
+
+def png_bytes(color, size=(48, 32)) -> bytes:
+    out = io.BytesIO()
+    Image.new('RGB', size, color).save(out, format='PNG')
+    return out.getvalue()
+
+
+async def fake_rembg_run(fn, contents, model, bounded=True):
+    # Full-opacity mask: keeps the whole image without loading a rembg model.
+    size = Image.open(io.BytesIO(contents)).size
+    out = io.BytesIO()
+    Image.new('L', size, 255).save(out, format='PNG')
+    return out.getvalue()
+
+
+@pytest.fixture
+def isolated_server(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'db', mongomock_motor.AsyncMongoMockClient()['bg_cache_gc'])
+    monkeypatch.setattr(server, 'BLOBS_DIR', tmp_path / 'blobs')
+    monkeypatch.setattr(server, 'BLOB_GC_GRACE_HOURS', 0)
+    monkeypatch.setattr(server, '_bg_mask_cache', server.TieredCache(tmp_path / 'masks', 1 << 24, 100, 1 << 20))
+    monkeypatch.setattr(server, '_bg_result_cache', server.TieredCache(tmp_path / 'results', 1 << 24, 100, 1 << 20))
+    monkeypatch.setattr(server._rembg_pool, 'run', fake_rembg_run)
+    return server
+
+
+def test_cached_result_survives_blob_gc(isolated_server):
+    async def scenario():
+        transport = httpx.ASGITransport(app=isolated_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            files = {'file': ('product.png', png_bytes((200, 40, 40)), 'image/png')}
+            first = await client.post('/api/remove-bg', files=files)
+            assert first.status_code == 200, first.text
+            assert first.json()['cached'] is False
+            blob_hash = first.json()['image_data'].rsplit('/', 1)[1]
+
+            gc = await client.post('/api/blobs/gc', params={'dry_run': 'false'})
+            assert gc.status_code == 200, gc.text
+            assert gc.json()['deleted'] >= 1
+            assert not isolated_server.blob_path(blob_hash).exists()
+
+            again = await client.post('/api/remove-bg', files=files)
+            assert again.status_code == 200, again.text
+            assert again.json()['cached'] is False
+            assert again.json()['image_data'] == first.json()['image_data']
+            assert isolated_server.blob_path(blob_hash).is_file()
+
+            blob = await client.get(again.json()['image_data'])
+            assert blob.status_code == 200
+            assert blob.headers['content-type'] == 'image/png'
+
+            cached = await client.post('/api/remove-bg', files=files)
+            assert cached.json()['cached'] is True
+
+    asyncio.run(scenario())
+
+
+def test_batch_reads_uploads_in_chunks(isolated_server, monkeypatch):
+    calls = []
+
+    async def fake_batch_run(fn, items, model, bounded=True):
+        calls.append(len(items))
+        return [(await fake_rembg_run(None, contents, model), None) for contents in items]
+
+    monkeypatch.setattr(server._rembg_pool, 'run', fake_batch_run)
+    monkeypatch.setattr(server._rembg_pool, 'workers', 1)
+    monkeypatch.setattr(server._image_pool, 'workers', 2)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=isolated_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            colors = [(10, 20, 30), (40, 50, 60), (70, 80, 90), (10, 20, 30), (100, 110, 120)]
+            files = [('files', (f'p{i}.png', png_bytes(c), 'image/png')) for i, c in enumerate(colors)]
+            r = await client.post('/api/remove-bg/batch', files=files)
+            assert r.status_code == 200, r.text
+            results = r.json()['results']
+            assert [x['file_name'] for x in results] == [f'p{i}.png' for i in range(5)]
+            assert all('image_data' in x for x in results)
+            assert results[3]['image_data'] == results[0]['image_data']
+
+    asyncio.run(scenario())
+    # Two images per chunk; the repeated image in the second chunk hits the mask cache.
+    assert calls == [2, 1, 1]
@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import io
+import os
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'catalog_test')
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'backend'))
+
+import server  # noqa: E402
+
+mongomock_motor = pytest.importorskip('mongomock_motor')
+
+OLD = '2000-01-01T00:00:00+00:00'
+
+
+def png_bytes(color) -> bytes:
+    out = io.BytesIO()
+    Image.new('RGB', (40, 30), color).save(out, format='PNG')
+    return out.getvalue()
+
+
+@pytest.fixture
+def isolated_server(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'db', mongomock_motor.AsyncMongoMockClient()['blob_gc'])
+    monkeypatch.setattr(server, 'BLOBS_DIR', tmp_path / 'blobs')
+    monkeypatch.setattr(server, 'EXPORT_JOBS_DIR', tmp_path / 'jobs')
+    monkeypatch.setattr(server, 'schedule_derivatives', lambda blob_hash: None)
+    return server
+
+
+async def stale_blob(data: bytes) -> str:
+    blob_hash = await server.put_blob(data)
+    await server.db.blobs.update_one({"hash": blob_hash}, {"$set": {"touched_at": OLD}})
+    return blob_hash
+
+
+def test_unreferenced_stale_blob_is_collected(isolated_server):
+    async def scenario():
+        blob_hash = await stale_blob(png_bytes((1, 2, 3)))
+        result = await server.collect_blob_garbage(dry_run=False)
+        assert result["deleted"] == 1
+        assert not server.blob_path(blob_hash).exists()
+
+    asyncio.run(scenario())
+
+
+def test_similar_match_restarts_grace_period(isolated_server):
+    async def scenario():
+        original = png_bytes((200, 10, 10))
+        blob_hash = await stale_blob(original)
+        phash = server.perceptual_hash(original)
+        await server.db.blobs.update_one({"hash": blob_hash}, {"$set": {"phash": phash, "phash_bands": server.phash_bands(phash)}})
+
+        out = io.BytesIO()
+        Image.open(io.BytesIO(original)).save(out, format='JPEG', quality=80)
+        uploaded = await server.ingest_image(out.getvalue(), 'image/jpeg')
+        assert [s["image_data"] for s in uploaded["similar"]] == [server.blob_ref(blob_hash)]
+
+        result = await server.collect_blob_garbage(dry_run=False)
+        assert result["deleted"] == 0
+        assert server.blob_path(blob_hash).is_file()
+
+    asyncio.run(scenario())
+
+
+def test_backup_import_of_existing_blob_restarts_grace_period(isolated_server):
+    async def scenario():
+        data = png_bytes((10, 200, 10))
+        blob_hash = await stale_blob(data)
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w') as zf:
+            zf.writestr(f"blobs/{blob_hash}.png", data)
+        with zipfile.ZipFile(buf) as zf:
+            result = await server.import_backup_v2(zf, "new")
+        assert result["blobs_existing"] == 1
+
+        gc = await server.collect_blob_garbage(dry_run=False)
+        assert gc["deleted"] == 0
+        assert server.blob_path(blob_hash).is_file()
+
+    asyncio.run(scenario())
+
+
+def test_backup_import_re_adds_blob_whose_record_was_collected(isolated_server):
+    async def scenario():
+        data = png_bytes((10, 10, 200))
+        blob_hash = hashlib.sha256(data).hexdigest()
+        path = server.blob_path(blob_hash)
+        path.parent.mkdir(parents=True)
+        path.write_bytes(data)  # file left behind, record already gone
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w') as zf:
+            zf.writestr(f"blobs/{blob_hash}.png", data)
+        with zipfile.ZipFile(buf) as zf:
+            result = await server.import_backup_v2(zf, "new")
+        assert result["blobs_added"] == 1
+        assert await server.db.blobs.count_documents({"hash": blob_hash}) == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'catalog_test')
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'backend'))
+
+import server  # noqa: E402
+
+mongomock_motor = pytest.importorskip('mongomock_motor')
+
+HTML = '<html><body><img src="/api/blobs/' + 'a' * 64 + '"></body></html>'
+
+
+async def fake_render_batch_entries(req, file_names):
+    assert req.html_content == HTML
+    for i, name in enumerate(file_names):
+        yield i, name, f"rendered {name}".encode()
+
+
+@pytest.fixture
+def isolated_server(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'db', mongomock_motor.AsyncMongoMockClient()['export_jobs'])
+    monkeypatch.setattr(server, 'EXPORT_JOBS_DIR', tmp_path / 'jobs')
+    monkeypatch.setattr(server, 'render_batch_entries', fake_render_batch_entries)
+    return server
+
+
+async def run_job(client, presets):
+    r = await client.post('/api/export/jobs', json={'html_content': HTML, 'presets': presets, 'catalog_name': 'Demo'})
+    assert r.status_code == 200, r.text
+    job_id = r.json()['id']
+    await asyncio.gather(*server._export_job_tasks)
+    return job_id
+
+
+def test_job_html_kept_on_disk_and_purged_after_retention(isolated_server):
+    async def scenario():
+        transport = httpx.ASGITransport(app=isolated_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            presets = [{'format': 'png', 'width': 1080, 'height': 1080, 'label': 'a'},
+                       {'format': 'png', 'width': 1200, 'height': 628, 'label': 'b'}]
+            job_id = await run_job(client, presets)
+            doc = await server.db.export_jobs.find_one({'id': job_id})
+            assert doc['status'] == 'done'
+            assert 'html_content' not in doc['request']
+            assert len(doc['html_hash']) == 64
+            assert not server.export_job_html_path(job_id).exists()
+            result = server.EXPORT_JOBS_DIR / doc['result_file']
+            assert result.is_file()
+
+            assert await server.purge_export_jobs() == 0
+            assert result.is_file()
+
+            await server.db.export_jobs.update_one({'id': job_id}, {'$set': {'updated_at': '2000-01-01T00:00:00+00:00'}})
+            assert await server.purge_export_jobs() == 1
+            assert not result.exists()
+            assert await server.db.export_jobs.count_documents({}) == 0
+            r = await client.get(f'/api/export/jobs/{job_id}/result')
+            assert r.status_code == 404
+
+    asyncio.run(scenario())
+
+
+def test_queued_job_html_counts_as_blob_ref(isolated_server):
+    async def scenario():
+        server.EXPORT_JOBS_DIR.mkdir(parents=True)
+        server.export_job_html_path('job-1').write_text(HTML, encoding='utf-8')
+        assert (await server.count_blob_refs()) == {'a' * 64: 1}
+
+    asyncio.run(scenario())
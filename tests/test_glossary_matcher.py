@@ -0,0 +1,59 @@
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'catalog_test')
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'backend'))
+
+from server import GlossaryMatcher, fold_case  # noqa: E402
+
+
+def translate(matcher, text):
+    protected, used = matcher.protect(text)
+    return protected, matcher.restore(protected, used)
+
+
+def test_fold_case_keeps_length():
+    for text in ("İZMİR", "ıIiİ", "Straße", "ﬁle İstanbul"):
+        assert len(fold_case(text)) == len(text)
+
+
+def test_turkish_casing_case_insensitive():
+    matcher = GlossaryMatcher([{"source_term": "İzmir", "target_term": "Smyrna", "case_sensitive": False}])
+    for city in ("İzmir", "İZMİR", "izmir", "IZMIR", "ızmır"):
+        protected, restored = translate(matcher, f"Ofis {city} merkez")
+        assert protected == "Ofis __GLOSS_0__ merkez"
+        assert restored == "Ofis Smyrna merkez"
+
+
+def test_case_sensitive_term_needs_exact_case():
+    matcher = GlossaryMatcher([{"source_term": "İzmir", "target_term": "Smyrna"}])
+    assert translate(matcher, "İzmir izmir")[1] == "Smyrna izmir"
+
+
+def test_leftmost_longest_selection():
+    matcher = GlossaryMatcher([
+        {"source_term": "ball", "target_term": "bilye"},
+        {"source_term": "ball valve", "target_term": "kuresel vana"},
+        {"source_term": "valve body", "target_term": "vana govdesi"},
+    ])
+    # "ball valve" starts first and is longer than "ball"; the overlapping
+    # "valve body" starts later and is skipped.
+    assert translate(matcher, "ball valve body")[1] == "kuresel vana body"
+    assert translate(matcher, "a valve body and a ball")[1] == "a vana govdesi and a bilye"
+
+
+def test_overlapping_terms_across_case_modes():
+    matcher = GlossaryMatcher([
+        {"source_term": "Steel", "target_term": "Celik"},
+        {"source_term": "stainless steel", "target_term": "paslanmaz celik", "case_sensitive": False},
+    ])
+    assert translate(matcher, "STAINLESS STEEL and Steel")[1] == "paslanmaz celik and Celik"
+
+
+def test_restore_ignores_unused_placeholders():
+    matcher = GlossaryMatcher([{"source_term": "valve", "target_term": "vana"}])
+    protected, used = matcher.protect("no terms here __GLOSS_0__")
+    assert used == set()
+    assert matcher.restore(protected, used) == "no terms here __GLOSS_0__"
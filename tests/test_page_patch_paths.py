@@ -0,0 +1,45 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'catalog_test')
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'backend'))
+
+from fastapi import HTTPException  # noqa: E402
+
+from server import PagePatch, page_patch_paths  # noqa: E402
+
+
+def test_valid_paths_are_sorted():
+    patch = PagePatch(set={"title": "x", "specs.0.value": 1, "a-b": 2}, unset=["subtitle"])
+    assert page_patch_paths(patch) == ["a-b", "specs.0.value", "subtitle", "title"]
+
+
+@pytest.mark.parametrize("path", ["", "a..b", ".a", "a.", "$set", "a b", "a.$[x]"])
+def test_invalid_path_rejected(path):
+    with pytest.raises(HTTPException) as exc:
+        page_patch_paths(PagePatch(set={path: 1}))
+    assert exc.value.status_code == 400
+    assert "Gecersiz alan yolu" in exc.value.detail
+
+
+@pytest.mark.parametrize("patch", [
+    PagePatch(set={"a": 1, "a.b": 2}),
+    PagePatch(set={"a": 1, "a-b": 2, "a.c": 3}),
+    PagePatch(set={"a.b": 1, "a.b-c": 2, "a.b.d.e": 3}),
+    PagePatch(set={"a.b": 1}, unset=["a"]),
+    PagePatch(set={"a": 1}, unset=["a"]),
+])
+def test_overlapping_paths_rejected(patch):
+    with pytest.raises(HTTPException) as exc:
+        page_patch_paths(patch)
+    assert exc.value.status_code == 400
+    assert "Cakisan alan yollari" in exc.value.detail
+
+
+def test_sibling_prefixes_allowed():
+    patch = PagePatch(set={"a": 1, "ab": 2, "a-b.c": 3, "a_b": 4})
+    assert page_patch_paths(patch) == ["a", "a-b.c", "a_b", "ab"]
@@ -0,0 +1,71 @@
+"""Translation pipeline benchmark against a running backend.
+
+Start the backend offline with the stub model, e.g.
+
+    TRANSLATION_PROVIDER=mock TRANSLATION_MOCK_LATENCY_MS=300 TRANSLATION_RATE_PER_MIN=0 uvicorn server:app --port 8001
+
+then run `python tests/translation_benchmark.py`. Each run uses fresh texts, so
+the first pass measures model calls and the second pass the translation memory.
+"""
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+import httpx
+
+API = os.environ.get('BACKEND_URL', 'http://localhost:8001').rstrip('/') + '/api'
+REQUESTS = int(os.environ.get('BENCH_REQUESTS', '200'))
+CONCURRENCY = int(os.environ.get('BENCH_CONCURRENCY', '20'))
+BATCH_SEGMENTS = int(os.environ.get('BENCH_BATCH_SEGMENTS', '500'))
+
+
+def make_texts(count, run_id):
+    return [f"Stainless ball valve {run_id} model {i % (count // 2 or 1)} for high pressure lines" for i in range(count)]
+
+
+async def single_requests(client, texts):
+    sem = asyncio.Semaphore(CONCURRENCY)
+    latencies = []
+
+    async def one(text):
+        async with sem:
+            start = time.perf_counter()
+            r = await client.post(f"{API}/translate", json={"text": text, "source_lang": "EN", "target_lang": "TR"})
+            r.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(t) for t in texts))
+    return time.perf_counter() - start, latencies
+
+
+def report(name, elapsed, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    print(f"{name:<18} {len(latencies):>5} req  {len(latencies) / elapsed:8.1f} req/s  "
+          f"p50 {statistics.median(latencies) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms")
+
+
+async def main():
+    run_id = uuid.uuid4().hex[:8]
+    async with httpx.AsyncClient(timeout=300) as client:
+        texts = make_texts(REQUESTS, run_id)
+        for label in ("single (cold)", "single (memory)"):
+            elapsed, latencies = await single_requests(client, texts)
+            report(label, elapsed, latencies)
+
+        segments = make_texts(BATCH_SEGMENTS, f"{run_id}-batch")
+        for label in ("batch (cold)", "batch (memory)"):
+            start = time.perf_counter()
+            r = await client.post(f"{API}/translate/batch", json={"segments": segments, "source_lang": "EN", "target_lang": "TR"})
+            r.raise_for_status()
+            print(f"{label:<18} {len(segments):>5} seg  {time.perf_counter() - start:8.2f} s  {r.json()['stats']}")
+
+        metrics = (await client.get(f"{API}/translate/metrics")).json()
+        print(f"provider={metrics['provider']} hit_rate={metrics['hit_rate']} entries={metrics['entries']}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())